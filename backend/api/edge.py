@@ -0,0 +1,184 @@
+import hashlib
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.module_loading import import_string
+
+from recipes.models import ChangeEvent
+
+PURGE_CHUNK_SIZE = 100
+
+
+class SurrogateKeyMixin:
+    """Помечает ответы ключами для кэширующего прокси перед API.
+
+    Анонимный GET-ответ прокси хранит EDGE_CACHE_TIMEOUT секунд или до
+    сброса по ключу из обработчика журнала изменений. Ответы
+    авторизованным пользователям помечаются, но не кэшируются.
+    """
+
+    def get_surrogate_keys(self, data):
+        return ()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        keys = ()
+        if (
+            settings.EDGE_CACHE_TIMEOUT
+            and request.method == "GET"
+            and isinstance(response, Response)
+            and status.is_success(response.status_code)
+        ):
+            # Ключи считаются до того, как fields уберет id из ответа.
+            keys = self.get_surrogate_keys(response.data)
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if keys:
+            response["Surrogate-Key"] = " ".join(sorted(keys))
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True)
+            else:
+                patch_cache_control(
+                    response, public=True, s_maxage=settings.EDGE_CACHE_TIMEOUT
+                )
+                response["X-Accel-Expires"] = settings.EDGE_CACHE_TIMEOUT
+            patch_vary_headers(response, ("Authorization",))
+        return response
+
+
+def recipe_surrogate_keys(recipes):
+    keys = {"tag:all", "ingredients"}
+    for recipe in recipes:
+        keys.add(f"recipe:{recipe['id']}")
+        author = recipe.get("author")
+        if isinstance(author, dict):
+            author = author["id"]
+        if author is not None:
+            keys.add(f"author:{author}")
+    return keys
+
+
+def event_surrogate_keys(events):
+    """Ключи ответов, устаревших после событий журнала изменений."""
+    keys = set()
+    for event in events:
+        if event.entity == ChangeEvent.RECIPE:
+            keys.add(f"recipe:{event.entity_id}")
+            if event.action != ChangeEvent.UPDATED:
+                keys.add("recipes")
+        elif event.entity == ChangeEvent.TAG:
+            keys.add("tag:all")
+        elif event.entity == ChangeEvent.INGREDIENT:
+            keys.add("ingredients")
+        elif event.entity == ChangeEvent.USER:
+            keys.add(f"author:{event.entity_id}")
+            if event.action != ChangeEvent.UPDATED:
+                keys.add("users")
+    return keys
+
+
+class DummyPurgeBackend:
+    """Без сброса: ответы живут в прокси EDGE_CACHE_TIMEOUT секунд."""
+
+    def purge(self, keys):
+        pass
+
+
+class HttpPurgeBackend:
+    """Запросы PURGE с заголовком Surrogate-Key на EDGE_PURGE_URL.
+
+    Так сбрасывают кэш по ключам Varnish с модулем xkey, Fastly и
+    совместимые с ними прокси. Ошибка прокси прерывает обработку
+    пачки событий, и consumeevents повторит ее.
+    """
+
+    def purge(self, keys):
+        import requests
+
+        keys = sorted(keys)
+        for start in range(0, len(keys), PURGE_CHUNK_SIZE):
+            response = requests.request(
+                "PURGE",
+                settings.EDGE_PURGE_URL,
+                headers={
+                    "Surrogate-Key": " ".join(
+                        keys[start:start + PURGE_CHUNK_SIZE]
+                    )
+                },
+                timeout=settings.EDGE_PURGE_TIMEOUT,
+            )
+            response.raise_for_status()
+
+
+class LocalPurgeBackend:
+    """Сброс локального кэша EdgeCacheMiddleware."""
+
+    def purge(self, keys):
+        tags = [f"edge:tag:{key}" for key in keys]
+        entries = set()
+        for urls in cache.get_many(tags).values():
+            entries.update(urls)
+        cache.delete_many([*entries, *tags])
+
+
+_backend = None
+
+
+def get_purge_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.EDGE_PURGE_BACKEND)()
+    return _backend
+
+
+def purge(keys):
+    if keys:
+        get_purge_backend().purge(keys)
+
+
+class EdgeCacheMiddleware:
+    """Локальная замена кэширующего прокси для разработки и тестов.
+
+    Отдает анонимные GET-запросы к API из кэша Django так же, как
+    прокси: ответы с Surrogate-Key и Cache-Control public хранятся
+    EDGE_CACHE_TIMEOUT секунд или до сброса LocalPurgeBackend.
+    Подключается в settings вместе с LocalPurgeBackend.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (
+            request.method not in ("GET", "HEAD")
+            or not request.path.startswith("/api/")
+            or "HTTP_AUTHORIZATION" in request.META
+        ):
+            return self.get_response(request)
+        key = "edge:{}".format(
+            hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        )
+        response = cache.get(key)
+        if response is not None:
+            response["X-Cache-Status"] = "HIT"
+            return response
+        response = self.get_response(request)
+        if (
+            response.status_code == status.HTTP_200_OK
+            and response.has_header("Surrogate-Key")
+            and "public" in response.get("Cache-Control", "")
+        ):
+            cache.set(key, response, settings.EDGE_CACHE_TIMEOUT)
+            for tag in response["Surrogate-Key"].split():
+                tag = f"edge:tag:{tag}"
+                cache.set(
+                    tag,
+                    {*cache.get(tag, ()), key},
+                    settings.EDGE_CACHE_TIMEOUT,
+                )
+        response["X-Cache-Status"] = "MISS"
+        return response
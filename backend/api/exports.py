@@ -0,0 +1,306 @@
+import codecs
+import hashlib
+import json
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from api.services import get_shopping_list
+from recipes.exports import export_recipes, recipe_to_dict
+from recipes.models import ExportJob, Ingredient, Recipe, Tag
+
+
+def catalogue_state():
+    """Теги и ингредиенты: их названия и единицы попадают в выгрузки."""
+    return [
+        *Tag.objects.aggregate(
+            count=Count("pk"), updated=Max("updated_at")
+        ).values(),
+        *Ingredient.objects.aggregate(
+            count=Count("pk"), updated=Max("updated_at")
+        ).values(),
+    ]
+
+
+def shopping_list_state(user):
+    return [
+        user.pk,
+        user.get_full_name(),
+        *catalogue_state(),
+        list(
+            user.shopping_cart.order_by("recipe_id").values_list(
+                "recipe_id",
+                "multiplier",
+                "recipe__servings",
+                "recipe__updated_at",
+            )
+        ),
+    ]
+
+
+def account_state(user):
+    return [
+        user.pk,
+        user.username,
+        user.email,
+        user.get_full_name(),
+        *catalogue_state(),
+        list(user.recipes.order_by("pk").values_list("pk", "updated_at")),
+        list(
+            user.favorited.order_by("recipe_id").values_list(
+                "recipe_id", "recipe__updated_at"
+            )
+        ),
+        list(
+            user.shopping_cart.order_by("recipe_id").values_list(
+                "recipe_id", "multiplier"
+            )
+        ),
+        list(
+            user.follower.order_by("author_id").values_list(
+                "author_id", "author__updated_at"
+            )
+        ),
+        list(
+            user.meal_plan.order_by("date", "slot").values_list(
+                "date", "slot", "recipe_id", "servings"
+            )
+        ),
+    ]
+
+
+def recipes_state(user):
+    """Выгрузка рецептов общая: от пользователя не зависит."""
+    return [
+        *Recipe.objects.aggregate(
+            count=Count("pk"),
+            last_id=Max("pk"),
+            updated=Max("updated_at"),
+            authors_updated=Max("author__updated_at"),
+        ).values(),
+        *catalogue_state(),
+    ]
+
+
+def render_shopping_list(user, file):
+    file.write(get_shopping_list(user).getvalue())
+
+
+def render_account(user, file):
+    recipe_ids = set(user.recipes.values_list("pk", flat=True))
+    data = {
+        "user": {
+            "email": user.email,
+            "username": user.username,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "date_joined": user.date_joined,
+        },
+        "recipes": [
+            recipe_to_dict(recipe)
+            for recipe in export_recipes().filter(pk__in=recipe_ids)
+        ],
+        "favorites": list(
+            user.favorited.order_by("recipe_id").values(
+                "recipe_id", "recipe__name"
+            )
+        ),
+        "shopping_cart": list(
+            user.shopping_cart.order_by("recipe_id").values(
+                "recipe_id", "recipe__name", "multiplier"
+            )
+        ),
+        "subscriptions": list(
+            user.follower.order_by("author_id").values(
+                "author_id", "author__username"
+            )
+        ),
+        "meal_plan": list(
+            user.meal_plan.order_by("date", "slot").values(
+                "date", "slot", "recipe_id", "servings"
+            )
+        ),
+    }
+    json.dump(
+        data,
+        codecs.getwriter("utf-8")(file),
+        cls=DjangoJSONEncoder,
+        ensure_ascii=False,
+        indent=2,
+    )
+
+
+def render_recipes(user, file):
+    """Пишет рецепты построчно, не собирая выгрузку в памяти."""
+    writer = codecs.getwriter("utf-8")(file)
+    for recipe in export_recipes().iterator(chunk_size=500):
+        json.dump(recipe_to_dict(recipe), writer, ensure_ascii=False)
+        writer.write("\n")
+
+
+RECLAIMED = "reclaimed"
+
+EXPORTS = {
+    ExportJob.SHOPPING_LIST: (
+        "txt",
+        shopping_list_state,
+        render_shopping_list,
+    ),
+    ExportJob.ACCOUNT: ("json", account_state, render_account),
+    ExportJob.RECIPES: ("jsonl", recipes_state, render_recipes),
+}
+
+
+def data_fingerprint(kind, user):
+    """Отпечаток исходных данных выгрузки без ее построения."""
+    _, state, _ = EXPORTS[kind]
+    return hashlib.md5(
+        json.dumps([kind, *state(user)], cls=DjangoJSONEncoder).encode()
+    ).hexdigest()
+
+
+def enqueue_export(user, kind):
+    """Ставит выгрузку в очередь, если ее нельзя переиспользовать.
+
+    Возвращает (задание, создано ли новое задание).
+    """
+    fingerprint = data_fingerprint(kind, user)
+    job = (
+        user.export_jobs.filter(
+            kind=kind,
+            fingerprint=fingerprint,
+            status__in=(ExportJob.PENDING, ExportJob.RUNNING, ExportJob.DONE),
+        )
+        .order_by("-id")
+        .first()
+    )
+    if job is not None:
+        return job, False
+    artifact = (
+        ExportJob.objects.filter(
+            kind=kind, fingerprint=fingerprint, status=ExportJob.DONE
+        )
+        .exclude(file="")
+        .order_by("-id")
+        .first()
+    )
+    if artifact is not None:
+        return (
+            ExportJob.objects.create(
+                user=user,
+                kind=kind,
+                fingerprint=fingerprint,
+                status=ExportJob.DONE,
+                file=artifact.file.name,
+                finished=timezone.now(),
+            ),
+            True,
+        )
+    return (
+        ExportJob.objects.create(
+            user=user, kind=kind, fingerprint=fingerprint
+        ),
+        True,
+    )
+
+
+def claim_jobs(limit):
+    """Забирает задания из очереди; занятые другим воркером пропускает.
+
+    Задания, воркер которых не отмечался дольше EXPORT_JOB_TIMEOUT,
+    запускаются повторно.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.EXPORT_JOB_TIMEOUT)
+    with transaction.atomic():
+        ids = list(
+            ExportJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=ExportJob.PENDING)
+                | Q(status=ExportJob.RUNNING, heartbeat__lt=stale)
+            )
+            .order_by("id")
+            .values_list("pk", flat=True)[:limit]
+        )
+        ExportJob.objects.filter(pk__in=ids).update(
+            status=ExportJob.RUNNING, started=now, heartbeat=now
+        )
+    return ids
+
+
+def touch_jobs(job_ids):
+    """Отмечает, что воркер еще выполняет задания."""
+    return ExportJob.objects.filter(
+        pk__in=job_ids, status=ExportJob.RUNNING
+    ).update(heartbeat=timezone.now())
+
+
+def run_job(job_id):
+    """Строит файл выгрузки. Выполняется в процессе пула runjobs.
+
+    Отпечаток пересчитывается перед построением, чтобы файл не
+    переиспользовался для данных, изменившихся в очереди. Результат
+    сохраняется, только если задание не забрал повторно другой воркер
+    и не пометили упавшим: дата запуска служит меткой захвата.
+    """
+    job = ExportJob.objects.select_related("user").get(pk=job_id)
+    extension, _, render = EXPORTS[job.kind]
+    try:
+        job.fingerprint = data_fingerprint(job.kind, job.user)
+        with tempfile.TemporaryFile() as file:
+            render(job.user, file)
+            job.file.save(
+                f"{uuid.uuid4().hex}.{extension}", File(file), save=False
+            )
+        job.status = ExportJob.DONE
+    except Exception as error:
+        job.status = ExportJob.FAILED
+        job.error = repr(error)
+    job.finished = timezone.now()
+    saved = ExportJob.objects.filter(
+        pk=job.pk, status=ExportJob.RUNNING, started=job.started
+    ).update(
+        status=job.status,
+        fingerprint=job.fingerprint,
+        file=job.file.name or "",
+        error=job.error,
+        finished=job.finished,
+    )
+    if not saved:
+        if job.file:
+            job.file.delete(save=False)
+        return RECLAIMED
+    return job.status
+
+
+def fail_jobs(job_ids, error):
+    """Помечает упавшими задания, процесс которых завершился аварийно."""
+    return ExportJob.objects.filter(
+        pk__in=job_ids, status=ExportJob.RUNNING
+    ).update(
+        status=ExportJob.FAILED, error=error, finished=timezone.now()
+    )
+
+
+def prune_exports():
+    """Удаляет устаревшие задания и файлы, на которые никто не ссылается."""
+    expired = ExportJob.objects.filter(
+        finished__lt=timezone.now()
+        - timedelta(seconds=settings.EXPORT_ARTIFACT_TTL)
+    )
+    files = set(expired.exclude(file="").values_list("file", flat=True))
+    count, _ = expired.delete()
+    files -= set(
+        ExportJob.objects.filter(file__in=files).values_list("file", flat=True)
+    )
+    storage = ExportJob._meta.get_field("file").storage
+    for name in files:
+        storage.delete(name)
+    return count
@@ -0,0 +1,162 @@
+import copy
+
+from rest_framework import serializers, status
+from rest_framework.response import Response
+
+
+def parse_fields(value):
+    """'id,author.username' -> {'id': {}, 'author': {'username': {}}}."""
+    tree = {}
+    for path in value.split(","):
+        node = tree
+        for name in filter(None, path.strip().split(".")):
+            node = node.setdefault(name, {})
+    return tree
+
+
+class Fieldset:
+    """Поля ответа из параметров fields и expand.
+
+    fields - список полей, вложенные через точку: author.username
+    оставляет у автора только username. Связи отдаются объектами, если
+    они есть в expand или у них запрошены вложенные поля, иначе - id.
+    Без обоих параметров ответ полный.
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        if "fields" not in params and "expand" not in params:
+            return None
+        return cls(
+            parse_fields(params["fields"]) if "fields" in params else None,
+            set(parse_fields(params.get("expand", ""))),
+        )
+
+    def includes(self, name):
+        return self.fields is None or name in self.fields
+
+    def expands(self, name):
+        return (
+            self.expand is None
+            or name in self.expand
+            or bool(self.fields and self.fields.get(name))
+        )
+
+    def nested(self, name):
+        """Поля вложенного объекта, None - все поля."""
+        if self.fields and self.fields.get(name):
+            return Fieldset(self.fields[name])
+        return None
+
+    def project(self, data, collapsed):
+        """Оставляет в готовом ответе только запрошенные поля.
+
+        collapsed - {связь: ключ id} для связей, которые без expand
+        заменяются на id.
+        """
+        result = {}
+        for name, value in data.items():
+            if not self.includes(name):
+                continue
+            if name in collapsed and not self.expands(name):
+                value = collapse(value, collapsed[name])
+            elif self.nested(name):
+                nested = self.nested(name)
+                value = (
+                    [nested.project(item, {}) for item in value]
+                    if isinstance(value, list)
+                    else nested.project(value, {})
+                )
+            result[name] = value
+        return result
+
+
+def collapse(value, key):
+    if isinstance(value, dict):
+        return value[key]
+    if isinstance(value, list):
+        return sorted(
+            item[key] if isinstance(item, dict) else item for item in value
+        )
+    return value
+
+
+class SparseFieldsSerializerMixin:
+    """Не строит поля, исключенные параметрами fields и expand.
+
+    Корневой сериализатор берет Fieldset из контекста, вложенный - у
+    родителя. Связи из collapsed_fields без expand заменяются полем с
+    id, что избавляет от join и вложенной сериализации. Поля из
+    required_fields остаются всегда: они нужны вьюсету, лишнее уберет
+    Fieldset.project.
+    """
+
+    collapsed_fields = {}
+    required_fields = ()
+
+    @property
+    def fieldset(self):
+        field = self
+        if isinstance(self.parent, serializers.ListSerializer):
+            field = self.parent
+        if field.parent is None:
+            return self.context.get("fieldset")
+        fieldset = getattr(field.parent, "fieldset", None)
+        return fieldset.nested(field.field_name) if fieldset else None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.fieldset
+        if fieldset is None:
+            return fields
+        for name in list(fields):
+            if not (fieldset.includes(name) or name in self.required_fields):
+                del fields[name]
+            elif name in self.collapsed_fields and not fieldset.expands(name):
+                fields[name] = copy.deepcopy(self.collapsed_fields[name])
+        return fields
+
+
+class FieldsetMixin:
+    """Вьюсет с параметрами fields и expand.
+
+    Сериализаторы строят только нужные поля, а успешные ответы на GET
+    окончательно обрезаются здесь же.
+    """
+
+    collapsed_fields = {}
+
+    def get_fieldset(self):
+        return Fieldset.from_request(self.request)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["fieldset"] = self.get_fieldset()
+        return context
+
+    def project(self, data):
+        """Применяет fields и expand к объекту, списку или странице."""
+        fieldset = self.get_fieldset()
+        if fieldset is None:
+            return data
+        if isinstance(data, dict) and "results" in data:
+            data["results"] = self.project(data["results"])
+            return data
+        if isinstance(data, dict):
+            return fieldset.project(data, self.collapsed_fields)
+        return [fieldset.project(item, self.collapsed_fields) for item in data]
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (
+            request.method == "GET"
+            and isinstance(response, Response)
+            and status.is_success(response.status_code)
+            and isinstance(response.data, (dict, list))
+        ):
+            response.data = self.project(response.data)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,41 @@
+from api.edge import event_surrogate_keys, purge
+from api.services import invalidate_feed_heads, reset_shared_payloads
+from recipes.events import handler
+from recipes.models import ChangeEvent, Recipe
+from users.models import Subscribe
+
+
+@handler(ChangeEvent.RECIPE, ChangeEvent.INGREDIENT, ChangeEvent.TAG)
+def reset_recipe_payloads(events):
+    """Сбрасывает общий кэш рецептов, в том числе после пакетной загрузки."""
+    reset_shared_payloads()
+
+
+@handler(ChangeEvent.RECIPE)
+def reset_followers_feed(events):
+    created = [
+        event.entity_id
+        for event in events
+        if event.action == ChangeEvent.CREATED
+    ]
+    if created:
+        invalidate_feed_heads(
+            Subscribe.objects.filter(
+                author__in=Recipe.objects.filter(pk__in=created).values(
+                    "author"
+                )
+            )
+            .values_list("user_id", flat=True)
+            .distinct()
+        )
+
+
+@handler(
+    ChangeEvent.RECIPE,
+    ChangeEvent.INGREDIENT,
+    ChangeEvent.TAG,
+    ChangeEvent.USER,
+)
+def purge_edge_cache(events):
+    """Сбрасывает в кэширующем прокси ответы с измененными объектами."""
+    purge(event_surrogate_keys(events))
@@ -0,0 +1,86 @@
+import hashlib
+import json
+from functools import wraps
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from django.conf import settings
+from django.core.cache import cache
+
+PENDING = "pending"
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request):
+    """Хеш метода, адреса и тела запроса."""
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(
+        f"{request.method}\n{request.path}\n{body}".encode()
+    ).hexdigest()
+
+
+def idempotent(view):
+    """Повторяет сохраненный ответ для запроса с тем же Idempotency-Key.
+
+    Ключ действует в пределах пользователя в течение
+    IDEMPOTENCY_KEY_TIMEOUT и хранится вместе с хешем метода, адреса и
+    тела запроса. Тот же ключ с другим запросом получает 422. Пока первый
+    запрос выполняется, повторы с тем же ключом получают 409. Ответы с
+    ошибкой сервера и исключения не сохраняются, такой запрос можно
+    повторить.
+    """
+
+    @wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if not key or not request.user.is_authenticated:
+            return view(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"errors": "Слишком длинный Idempotency-Key."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        cache_key = f"idempotency:{request.user.pk}:{key}"
+        fingerprint = request_fingerprint(request)
+        if not cache.add(
+            cache_key,
+            (fingerprint, PENDING),
+            settings.IDEMPOTENCY_KEY_TIMEOUT,
+        ):
+            stored = cache.get(cache_key)
+            if stored is not None and stored[0] != fingerprint:
+                return Response(
+                    {
+                        "errors": (
+                            "Idempotency-Key уже использован "
+                            "с другим запросом."
+                        )
+                    },
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if stored is None or stored[1] == PENDING:
+                return Response(
+                    {"errors": "Запрос с этим ключом еще выполняется."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            _, data, status_code = stored
+            response = Response(data, status=status_code)
+            response["Idempotent-Replayed"] = "true"
+            return response
+        try:
+            response = view(self, request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+        if response.status_code >= 500:
+            cache.delete(cache_key)
+        else:
+            cache.set(
+                cache_key,
+                (fingerprint, response.data, response.status_code),
+                settings.IDEMPOTENCY_KEY_TIMEOUT,
+            )
+        return response
+
+    return wrapper
@@ -0,0 +1,50 @@
+import time
+
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from api import throttling
+from api.views import RecipeViewSet
+
+
+class Command(BaseCommand):
+    help = "Замер накладных расходов TokenBucketThrottle на один запрос"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=100000)
+        parser.add_argument("--clients", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        view = RecipeViewSet(action="list")
+        requests = []
+        for number in range(options["clients"]):
+            request = Request(
+                factory.get(
+                    "/api/recipes/?limit=12",
+                    REMOTE_ADDR=f"10.0.{number // 256}.{number % 256}",
+                )
+            )
+            request.user = AnonymousUser()
+            requests.append(request)
+        for backend in (
+            "api.throttling.LocalBucketBackend",
+            "api.throttling.CacheBucketBackend",
+        ):
+            throttling._backend = import_string(backend)()
+            throttle = throttling.TokenBucketThrottle()
+            started = time.perf_counter()
+            for number in range(options["iterations"]):
+                throttle.allow_request(
+                    requests[number % len(requests)], view
+                )
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{backend}: "
+                f"{elapsed / options['iterations'] * 1e6:.2f} мкс/запрос"
+            )
+        throttling._backend = None
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from api.serializers import refresh_recipe_cards
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        "Построение сохраненных карточек рецептов. По умолчанию только "
+        "для рецептов без карточки, например после импорта."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Перестроить карточки всех рецептов",
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.order_by("pk")
+        if not options["all"]:
+            recipes = recipes.filter(card_json__isnull=True)
+        cards = refresh_recipe_cards(recipes.values_list("pk", flat=True))
+        self.stdout.write(
+            self.style.SUCCESS(f"Построено карточек: {len(cards)}")
+        )
@@ -0,0 +1,123 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.exports import (claim_jobs, fail_jobs, prune_exports, run_job,
+                         touch_jobs,)
+
+PRUNE_INTERVAL = 3600
+HEARTBEAT_INTERVAL = settings.EXPORT_JOB_TIMEOUT / 4
+CRASH_ERROR = "Процесс выгрузки завершился аварийно."
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполнение фоновых выгрузок из очереди ExportJob в пуле "
+        "процессов. Несколько воркеров могут работать одновременно: "
+        "задание забирает только один из них."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.EXPORT_WORKERS,
+            help="Количество процессов пула",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Пауза между опросами пустой очереди, в секундах",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Выполнить задания из очереди и завершиться",
+        )
+
+    def handle(self, *args, **options):
+        self.workers = max(1, options["workers"])
+        self.running = {}
+        self.pool = self.create_pool()
+        pruned = 0
+        touched = time.monotonic()
+        try:
+            while True:
+                if time.monotonic() - pruned >= PRUNE_INTERVAL:
+                    count = prune_exports()
+                    if count:
+                        self.stdout.write(f"Удалено выгрузок: {count}")
+                    pruned = time.monotonic()
+                # Отметка не дает другим воркерам забрать долгие задания.
+                if (
+                    self.running
+                    and time.monotonic() - touched >= HEARTBEAT_INTERVAL
+                ):
+                    touch_jobs(list(self.running.values()))
+                    touched = time.monotonic()
+                for job_id in claim_jobs(self.workers - len(self.running)):
+                    self.submit(job_id)
+                if not self.running:
+                    if options["once"]:
+                        return
+                    time.sleep(options["interval"])
+                    continue
+                done, _ = wait(
+                    self.running,
+                    timeout=options["interval"],
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    self.report(future)
+        finally:
+            self.pool.shutdown()
+
+    def create_pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        )
+
+    def restart_pool(self, crashed=()):
+        """Заменяет пул, в котором аварийно завершился процесс.
+
+        Такой пул больше не принимает задания, а выполнявшиеся в нем
+        задания потеряны: какое из них уронило процесс, неизвестно,
+        поэтому все они помечаются упавшими.
+        """
+        job_ids = [*crashed, *self.running.values()]
+        self.running.clear()
+        if job_ids:
+            fail_jobs(job_ids, CRASH_ERROR)
+            self.stderr.write(
+                f"{CRASH_ERROR} Задания: {', '.join(map(str, job_ids))}"
+            )
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = self.create_pool()
+
+    def submit(self, job_id):
+        try:
+            future = self.pool.submit(run_job, job_id)
+        except BrokenProcessPool:
+            self.restart_pool()
+            future = self.pool.submit(run_job, job_id)
+        self.running[future] = job_id
+
+    def report(self, future):
+        job_id = self.running.pop(future, None)
+        if job_id is None:
+            # Задание уже помечено упавшим при замене пула.
+            return
+        try:
+            self.stdout.write(f"Выгрузка {job_id}: {future.result()}")
+        except BrokenProcessPool:
+            self.restart_pool(crashed=(job_id,))
+        except Exception as error:
+            self.stderr.write(f"Ошибка выгрузки {job_id}: {error!r}")
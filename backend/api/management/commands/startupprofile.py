@@ -0,0 +1,76 @@
+import os
+import re
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+STARTUP_CODE = """
+import os
+import django
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodgram.settings")
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+"""
+IMPORT_LINE = re.compile(
+    r"import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \| "
+    r"(?P<indent>\s*)(?P<module>\S+)"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Профиль холодного старта: python -X importtime для загрузки "
+        "настроек, приложений и URL-конфигурации"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=25,
+            help="Сколько самых тяжелых импортов показать",
+        )
+        parser.add_argument(
+            "--output",
+            help="Файл для полного отчета -X importtime",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_CODE],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+            capture_output=True,
+            text=True,
+        )
+        elapsed = time.perf_counter() - started
+        if result.returncode:
+            raise CommandError(result.stderr[-2000:])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(result.stderr)
+        imports = [
+            match.groupdict()
+            for match in map(IMPORT_LINE.match, result.stderr.splitlines())
+            if match
+        ]
+        top_level = [item for item in imports if not item["indent"]]
+        total = sum(int(item["cumulative"]) for item in top_level)
+        self.stdout.write(
+            f"Холодный старт: {elapsed:.3f} с, "
+            f"из них импорт модулей {total / 1e6:.3f} с "
+            f"({len(imports)} модулей)"
+        )
+        self.stdout.write("cumulative, мс | self, мс | модуль")
+        for item in sorted(
+            top_level, key=lambda item: -int(item["cumulative"])
+        )[:options["top"]]:
+            self.stdout.write(
+                f"{int(item['cumulative']) / 1000:>14.1f} | "
+                f"{int(item['self']) / 1000:>8.1f} | {item['module']}"
+            )
@@ -0,0 +1,133 @@
+from django.core.cache import cache
+from django.db.models import FloatField
+from django.db.models.functions import Cast, Coalesce
+
+from recipes.models import Ingredient, RecipeIngredient
+
+NUTRIENTS = ("calories", "proteins", "fats", "carbohydrates", "price")
+PRECISION = {"calories": 1, "proteins": 1, "fats": 1, "carbohydrates": 1,
+             "price": 2}
+CATALOGUE_VERSION_KEY = "nutrition:catalogue:version"
+
+# numpy импортируется внутри функций: модуль загружается вместе с
+# сериализаторами при старте воркера, а расчеты нужны не каждому запросу.
+_catalogue = None
+_catalogue_version = None
+
+
+def _load_catalogue():
+    """Загружает справочник ингредиентов в плотный массив.
+
+    Строка массива соответствует id ингредиента, столбец - показателю
+    из NUTRIENTS. Незаполненные показатели считаются нулевыми.
+    """
+    import numpy as np
+
+    rows = np.array(
+        list(Ingredient.objects.values_list("id", *NUTRIENTS)),
+        dtype=np.float64,
+    ).reshape(-1, len(NUTRIENTS) + 1)
+    ids = rows[:, 0].astype(np.int64)
+    values = np.zeros(
+        (ids.max() + 1 if ids.size else 0, len(NUTRIENTS)), dtype=np.float32
+    )
+    values[ids] = np.nan_to_num(rows[:, 1:])
+    return values
+
+
+def get_catalogue(min_size=0):
+    """Возвращает справочник, перечитывая его при смене версии."""
+    global _catalogue, _catalogue_version
+    version = cache.get(CATALOGUE_VERSION_KEY, 0)
+    if (
+        _catalogue is None
+        or _catalogue_version != version
+        or _catalogue.shape[0] < min_size
+    ):
+        _catalogue = _load_catalogue()
+        _catalogue_version = version
+    return _catalogue
+
+
+def reset_catalogue():
+    """Помечает справочник устаревшим во всех процессах."""
+    cache.set(CATALOGUE_VERSION_KEY, cache.get(CATALOGUE_VERSION_KEY, 0) + 1)
+
+
+def _weighted_values(ingredients, amounts):
+    """Значения показателей для пар (ингредиент, количество)."""
+    import numpy as np
+
+    catalogue = get_catalogue(
+        min_size=ingredients.max() + 1 if ingredients.size else 0
+    )
+    return catalogue[ingredients].astype(np.float64) * amounts[:, None]
+
+
+def _as_dict(totals):
+    return {
+        name: round(float(value), PRECISION[name])
+        for name, value in zip(NUTRIENTS, totals)
+    }
+
+
+def get_recipes_totals(recipe_ids):
+    """Считает показатели для набора рецептов за один проход.
+
+    Возвращает словарь {id рецепта: {показатель: значение}}.
+    """
+    import numpy as np
+
+    rows = np.array(
+        list(
+            RecipeIngredient.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list("recipe_id", "ingredient_id", "amount")
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    recipes, positions = np.unique(rows[:, 0], return_inverse=True)
+    totals = np.zeros((recipes.size, len(NUTRIENTS)))
+    np.add.at(totals, positions, _weighted_values(rows[:, 1], rows[:, 2]))
+    result = {
+        recipe_id: _as_dict(np.zeros(len(NUTRIENTS)))
+        for recipe_id in recipe_ids
+    }
+    result.update(
+        (int(recipe_id), _as_dict(row))
+        for recipe_id, row in zip(recipes, totals)
+    )
+    return result
+
+
+def get_cart_totals(user):
+    """Считает показатели всего списка покупок пользователя.
+
+    Количество масштабируется на порции к приготовлению, как в самом
+    списке покупок.
+    """
+    import numpy as np
+
+    rows = np.array(
+        list(
+            RecipeIngredient.objects.filter(
+                recipe__shopping_cart__user=user
+            ).values_list(
+                "ingredient_id",
+                Cast("amount", FloatField())
+                * Cast(
+                    Coalesce(
+                        "recipe__shopping_cart__multiplier",
+                        "recipe__servings",
+                        output_field=FloatField(),
+                    ),
+                    FloatField(),
+                )
+                / Cast("recipe__servings", FloatField()),
+            )
+        ),
+        dtype=np.float64,
+    ).reshape(-1, 2)
+    return _as_dict(
+        _weighted_values(rows[:, 0].astype(np.int64), rows[:, 1]).sum(axis=0)
+    )
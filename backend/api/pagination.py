@@ -1,8 +1,66 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination,)
+from rest_framework.response import Response
 
+from django.conf import settings
 from django.core import paginator
 
+from recipes.events import events_after
+
 
 class CustomPagination(PageNumberPagination):
     django_paginator_class = paginator.Paginator
     page_size_query_param = "limit"
+    max_page_size = settings.MAX_PAGE_SIZE
+
+
+class TrendingPagination(CursorPagination):
+    """Keyset-пагинация по месту в предрассчитанном рейтинге."""
+
+    ordering = "trending_position"
+    page_size_query_param = "limit"
+    max_page_size = settings.MAX_PAGE_SIZE
+
+
+class FeedPagination(CursorPagination):
+    """Keyset-пагинация ленты подписок по дате публикации."""
+
+    ordering = "-pub_date"
+    page_size_query_param = "limit"
+    max_page_size = settings.MAX_PAGE_SIZE
+
+
+class ChangesPagination(BasePagination):
+    """Keyset-пагинация журнала изменений по номеру транзакции.
+
+    Клиент передает в since значение next из предыдущего ответа.
+    """
+
+    since_query_param = "since"
+    page_size_query_param = "limit"
+    page_size = settings.MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        try:
+            self.since = int(params.get(self.since_query_param, 0))
+            page_size = int(
+                params.get(self.page_size_query_param, self.page_size)
+            )
+        except ValueError:
+            raise ValidationError("since и limit должны быть числами.")
+        page_size = max(1, min(page_size, self.page_size))
+        self.page, self.next, self.has_more = events_after(
+            queryset, self.since, page_size
+        )
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.next,
+                "has_more": self.has_more,
+                "results": data,
+            }
+        )
@@ -0,0 +1,163 @@
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+import uuid
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.utils.text import slugify
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+PROFILE_PARAM = "profile"
+PROFILE_STATS_LIMIT = 40
+
+storage = FileSystemStorage(location=settings.PROFILE_ROOT)
+slots = threading.BoundedSemaphore(settings.PROFILE_MAX_CONCURRENT)
+
+
+def is_staff(request):
+    """Сотрудник по сессии или по токену API.
+
+    Токен проверяется здесь же: DRF аутентифицирует запрос только во
+    вьюсете, а профилирование начинается раньше.
+    """
+    if request.user.is_authenticated:
+        return request.user.is_staff
+    try:
+        result = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return result is not None and result[0].is_staff
+
+
+def wants_profile(request):
+    return (
+        request.META.get(PROFILE_HEADER) == "1"
+        or request.GET.get(PROFILE_PARAM) == "1"
+    )
+
+
+def save_profile(profiler, request):
+    """Сохраняет pstats и текстовую сводку, возвращает имя профиля."""
+    name = "{}-{}".format(
+        slugify(request.path.replace("/", "-")) or "root",
+        uuid.uuid4().hex[:12],
+    )
+    profiler.create_stats()
+    storage.save(f"{name}.prof", ContentFile(marshal.dumps(profiler.stats)))
+    summary = io.StringIO()
+    summary.write(f"{request.method} {request.get_full_path()}\n\n")
+    pstats.Stats(profiler, stream=summary).sort_stats(
+        pstats.SortKey.CUMULATIVE
+    ).print_stats(PROFILE_STATS_LIMIT)
+    storage.save(f"{name}.txt", ContentFile(summary.getvalue().encode()))
+    prune_profiles()
+    return name
+
+
+def list_profiles():
+    """Имена сохраненных профилей, новые первыми."""
+    if not storage.exists(""):
+        return []
+    _, files = storage.listdir("")
+    names = [name[:-5] for name in files if name.endswith(".prof")]
+    return sorted(
+        names,
+        key=lambda name: storage.get_modified_time(f"{name}.prof"),
+        reverse=True,
+    )
+
+
+def prune_profiles():
+    for name in list_profiles()[settings.PROFILE_KEEP:]:
+        storage.delete(f"{name}.prof")
+        if storage.exists(f"{name}.txt"):
+            storage.delete(f"{name}.txt")
+
+
+class ProfilingMiddleware:
+    """Профилирование одного запроса по просьбе сотрудника.
+
+    Запрос с заголовком X-Profile: 1 или параметром ?profile=1
+    выполняется под cProfile, результат сохраняется в PROFILE_ROOT и
+    доступен сотрудникам на странице admin/profiles/. Одновременно
+    профилируется не больше PROFILE_MAX_CONCURRENT запросов на
+    процесс, остальные выполняются как обычно с X-Profile: busy.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILE_MAX_CONCURRENT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (wants_profile(request) and is_staff(request)):
+            return self.get_response(request)
+        if not slots.acquire(blocking=False):
+            return self.busy(request)
+        try:
+            return self.profile(request)
+        finally:
+            slots.release()
+
+    def busy(self, request):
+        response = self.get_response(request)
+        response["X-Profile"] = "busy"
+        return response
+
+    def profile(self, request):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # В потоке уже работает другой профилировщик.
+            return self.busy(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        name = save_profile(profiler, request)
+        response["X-Profile"] = name
+        response["X-Profile-Url"] = request.build_absolute_uri(
+            reverse("admin-profile", args=(name,))
+        )
+        return response
+
+
+def profiles_view(request):
+    """Список сохраненных профилей для администраторов."""
+    profiles = []
+    for name in list_profiles():
+        summary = ""
+        if storage.exists(f"{name}.txt"):
+            with storage.open(f"{name}.txt") as file:
+                summary = file.read().decode()
+        profiles.append({"name": name, "summary": summary})
+    context = {
+        **admin.site.each_context(request),
+        "title": "Профили запросов",
+        "profiles": profiles,
+        "max_concurrent": settings.PROFILE_MAX_CONCURRENT,
+    }
+    return TemplateResponse(request, "admin/profiles.html", context)
+
+
+def profile_download_view(request, name):
+    """Файл pstats: snakeviz, flameprof или python -m pstats."""
+    filename = f"{name}.prof"
+    if not storage.exists(filename):
+        raise Http404
+    return FileResponse(
+        storage.open(filename), as_attachment=True, filename=filename
+    )
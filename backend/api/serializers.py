@@ -2,16 +2,24 @@ import base64
 
 from djoser.serializers import UserCreateSerializer
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 from rest_framework.serializers import ModelSerializer
 
 from django.core.files.base import ContentFile
 from django.core.validators import MinValueValidator
 from django.db import transaction
+from django.db.models import Prefetch
 
+from api.fieldsets import SparseFieldsSerializerMixin
+from api.nutrition import get_recipes_totals
+from api.services import sync_ingredient_ids
 from api.validators import validate_recipe_name
-from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.models import (ChangeEvent, ExportJob, Ingredient, MealPlan,
+                            Recipe, RecipeIngredient, ShoppingCart, Tag,)
 from users.models import Subscribe, User
 
+CARDS_CHUNK_SIZE = 500
+
 
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
@@ -21,25 +29,79 @@ class Base64ImageField(serializers.ImageField):
             data = ContentFile(base64.b64decode(imgstr), name="temp." + ext)
         return super().to_internal_value(data)
 
-    def get_file_extension(self, file_name, decoded_file):
-        import imghdr
 
-        extension = imghdr.what(file_name, decoded_file)
-        extension = "jpg" if extension == "jpeg" else extension
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Список связанных объектов, загружаемый одним запросом.
 
-        return extension
+    Обо всех несуществующих id сообщает одной ошибкой. Объекты,
+    заранее загруженные в context["preloaded"], повторно не читаются.
+    """
 
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, "__iter__"):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail("empty")
+        child = self.child_relation
+        try:
+            pks = [int(pk) for pk in data]
+        except (TypeError, ValueError):
+            raise serializers.ValidationError(
+                child.error_messages["incorrect_type"].format(
+                    data_type="list"
+                )
+            )
+        queryset = child.get_queryset()
+        objects = self.context.get("preloaded", {}).get(queryset.model)
+        if objects is None:
+            objects = queryset.in_bulk(pks)
+        missing = sorted(set(pks) - objects.keys())
+        if missing:
+            raise serializers.ValidationError(
+                f"Не найдены объекты с id: {', '.join(map(str, missing))}."
+            )
+        return [objects[pk] for pk in dict.fromkeys(pks)]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Связанный объект, который можно взять из context["preloaded"]."""
 
-class CustomUserSerializer(UserCreateSerializer):
+    def to_internal_value(self, data):
+        objects = self.context.get("preloaded", {}).get(
+            self.get_queryset().model
+        )
+        if objects is None:
+            return super().to_internal_value(data)
+        try:
+            return objects[int(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+
+class CustomUserSerializer(SparseFieldsSerializerMixin, UserCreateSerializer):
     """Сериализатор класса Пользователей"""
 
+    required_fields = ("id",)
+
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = "__all__"
+        exclude = ("updated_at",)
 
     def get_is_subscribed(self, author):
+        if self.context.get("shared"):
+            return False
         if (
             self.context.get("request")
             and not self.context["request"].user.is_anonymous
@@ -55,7 +117,7 @@ class TagSerializer(ModelSerializer):
 
     class Meta:
         model = Tag
-        fields = "__all__"
+        exclude = ("updated_at",)
 
 
 class IngredientSerializer(ModelSerializer):
@@ -63,7 +125,7 @@ class IngredientSerializer(ModelSerializer):
 
     class Meta:
         model = Ingredient
-        fields = "__all__"
+        exclude = ("unit", "updated_at")
 
 
 class ShortIngredientSerializer(ModelSerializer):
@@ -102,34 +164,115 @@ class GetIngredientRecipeSerializer(ModelSerializer):
         return obj.amount
 
 
-class RecipeReadSerializer(ModelSerializer):
+class RecipeReadListSerializer(serializers.ListSerializer):
+    """Считает пищевую ценность всей страницы рецептов одним проходом."""
+
+    def to_representation(self, data):
+        recipes = list(data.all() if hasattr(data, "all") else data)
+        if "nutrition" in self.child.fields:
+            self.context["nutrition"] = get_recipes_totals(
+                [recipe.pk for recipe in recipes]
+            )
+        return super().to_representation(recipes)
+
+
+class RecipeReadSerializer(SparseFieldsSerializerMixin, ModelSerializer):
     """Сериализатор класса чтения рецепта"""
 
+    collapsed_fields = {
+        "author": serializers.PrimaryKeyRelatedField(read_only=True),
+        "tags": serializers.PrimaryKeyRelatedField(many=True, read_only=True),
+        "ingredients": serializers.ListField(
+            source="ingredient_ids", read_only=True
+        ),
+    }
+    required_fields = ("id", "author")
+
     tags = TagSerializer(many=True, read_only=True)
     author = CustomUserSerializer(read_only=True)
     ingredients = serializers.SerializerMethodField(read_only=True)
     image = Base64ImageField(read_only=True)
     is_favorited = serializers.BooleanField(read_only=True, default=False)
-    is_in_shopping_cart = serializers.BooleanField(read_only=True)
+    is_in_shopping_cart = serializers.BooleanField(
+        read_only=True, default=False
+    )
+    nutrition = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = "__all__"
+        exclude = ("ingredient_ids", "card_json")
+        list_serializer_class = RecipeReadListSerializer
 
     @property
     def user(self):
         return self.context["request"].user
 
     def get_ingredients(self, obj):
-        ingredients = RecipeIngredient.objects.filter(recipe=obj)
-        serializer = GetIngredientRecipeSerializer(ingredients, many=True)
+        serializer = GetIngredientRecipeSerializer(
+            obj.recipes.all(), many=True
+        )
         return serializer.data
 
+    def get_nutrition(self, obj):
+        totals = self.context.get("nutrition") or {}
+        if obj.pk not in totals:
+            totals = get_recipes_totals([obj.pk])
+        return totals[obj.pk]
+
+
+def ingredients_prefetch():
+    """Ингредиенты рецептов для RecipeReadSerializer одним запросом."""
+    return Prefetch(
+        "recipes",
+        queryset=RecipeIngredient.objects.select_related(
+            "ingredient"
+        ).order_by("pk"),
+    )
+
+
+def refresh_recipe_cards(recipe_ids):
+    """Перестраивает сохраненные карточки рецептов.
+
+    Карточка - ответ RecipeReadSerializer без флагов пользователя,
+    их проставляет overlay_user_state при чтении. Вызывается в
+    транзакции изменения, чтобы карточка не расходилась с рецептом.
+    """
+    recipe_ids = list(recipe_ids)
+    cards = {}
+    for start in range(0, len(recipe_ids), CARDS_CHUNK_SIZE):
+        recipes = list(
+            Recipe.objects.filter(
+                pk__in=recipe_ids[start:start + CARDS_CHUNK_SIZE]
+            )
+            .select_related("author")
+            .prefetch_related("tags", ingredients_prefetch())
+        )
+        data = RecipeReadSerializer(
+            recipes, many=True, context={"shared": True}
+        ).data
+        for recipe, card in zip(recipes, data):
+            recipe.card_json = cards[recipe.pk] = card
+        Recipe.objects.bulk_update(recipes, ("card_json",))
+    return cards
+
+
+def recipe_cards(recipes, request):
+    """Карточки рецептов из базы; отсутствующие строятся на лету."""
+    missing = [recipe.pk for recipe in recipes if recipe.card_json is None]
+    cards = refresh_recipe_cards(missing) if missing else {}
+    result = []
+    for recipe in recipes:
+        card = dict(recipe.card_json or cards[recipe.pk])
+        if card["image"]:
+            card["image"] = request.build_absolute_uri(card["image"])
+        result.append(card)
+    return result
+
 
 class RecipeWriteSerializer(ModelSerializer):
     """Сериализатор класса записи рецепта"""
 
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all(),
     )
@@ -153,44 +296,83 @@ class RecipeWriteSerializer(ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = "__all__"
+        exclude = ("ingredient_ids", "card_json")
         read_only_fields = ("author",)
 
-    def validate(self, data):
-        ingredients_list = []
-        for ingredient in data.get("ingredients"):
-            if ingredient.get("amount") <= 0:
-                raise serializers.ValidationError(
-                    "Количество ингредиента не может быть равно нулю."
+    @staticmethod
+    def preload(items):
+        """Загружает теги и ингредиенты для пакета рецептов.
+
+        Результат передается в context["preloaded"], и проверка каждого
+        рецепта пакета обходится без запросов к справочникам.
+        """
+        tag_ids, ingredient_ids = set(), set()
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            tags = item.get("tags")
+            if isinstance(tags, list):
+                tag_ids.update(
+                    int(pk) for pk in tags if str(pk).isdigit()
+                )
+            ingredients = item.get("ingredients")
+            if isinstance(ingredients, list):
+                ingredient_ids.update(
+                    int(ingredient["id"])
+                    for ingredient in ingredients
+                    if isinstance(ingredient, dict)
+                    and str(ingredient.get("id")).isdigit()
                 )
-            ingredients_list.append(ingredient.get("id"))
-        if len(set(ingredients_list)) != len(ingredients_list):
+        return {
+            Tag: Tag.objects.in_bulk(tag_ids),
+            Ingredient: set(
+                Ingredient.objects.filter(pk__in=ingredient_ids)
+                .order_by()
+                .values_list("pk", flat=True)
+            ),
+        }
+
+    def validate_ingredients(self, ingredients):
+        """Проверяет все ингредиенты рецепта одним запросом."""
+        ids = [ingredient["id"] for ingredient in ingredients]
+        if len(set(ids)) != len(ids):
             raise serializers.ValidationError(
                 "Дублировать ингредиенты в рецепте нельзя!"
             )
-        return super().validate(data)
+        if any(ingredient["amount"] <= 0 for ingredient in ingredients):
+            raise serializers.ValidationError(
+                "Количество ингредиента не может быть равно нулю."
+            )
+        known = self.context.get("preloaded", {}).get(Ingredient)
+        if known is None:
+            known = set(
+                Ingredient.objects.filter(pk__in=ids)
+                .order_by()
+                .values_list("pk", flat=True)
+            )
+        missing = sorted(set(ids) - known)
+        if missing:
+            raise serializers.ValidationError(
+                "Не найдены ингредиенты с id: "
+                f"{', '.join(map(str, missing))}."
+            )
+        return ingredients
 
     @transaction.atomic
     def tags_and_ingredients_set(self, recipe, tags, ingredients):
-        recipe.tags.set(tags)
-        if ingredients:
-            ingredient_ids = [
-                ingredient.get("id") for ingredient in ingredients
-            ]
-            ingredients_queryset = Ingredient.objects.filter(
-                pk__in=ingredient_ids
-            )
-            recipe_ingredients = [
+        if tags is not None:
+            recipe.tags.set(tags)
+        if ingredients is not None:
+            RecipeIngredient.objects.filter(recipe=recipe).delete()
+            RecipeIngredient.objects.bulk_create(
                 RecipeIngredient(
                     recipe=recipe,
-                    ingredient=ingredient,
-                    amount=ingredient_data["amount"],
+                    ingredient_id=ingredient["id"],
+                    amount=ingredient["amount"],
                 )
-                for ingredient_data, ingredient in zip(
-                    ingredients, ingredients_queryset
-                )
-            ]
-            RecipeIngredient.objects.bulk_create(recipe_ingredients)
+                for ingredient in ingredients
+            )
+            sync_ingredient_ids((recipe.pk,))
 
     @transaction.atomic
     def create(self, validated_data):
@@ -200,6 +382,7 @@ class RecipeWriteSerializer(ModelSerializer):
             author=self.context["request"].user, **validated_data
         )
         self.tags_and_ingredients_set(recipe, tags, ingredients)
+        refresh_recipe_cards((recipe.pk,))
         return recipe
 
     @transaction.atomic
@@ -210,13 +393,14 @@ class RecipeWriteSerializer(ModelSerializer):
         instance.cooking_time = validated_data.get(
             "cooking_time", instance.cooking_time
         )
-        tags = validated_data.pop("tags")
-        ingredients = validated_data.get("ingredients")
-        RecipeIngredient.objects.filter(
-            recipe=instance, ingredient__in=instance.ingredients.all()
-        ).delete()
-        self.tags_and_ingredients_set(instance, tags, ingredients)
+        instance.servings = validated_data.get("servings", instance.servings)
         instance.save()
+        self.tags_and_ingredients_set(
+            instance,
+            validated_data.get("tags"),
+            validated_data.get("ingredients"),
+        )
+        refresh_recipe_cards((instance.pk,))
         return instance
 
     def to_representation(self, instance):
@@ -224,6 +408,12 @@ class RecipeWriteSerializer(ModelSerializer):
         return data
 
 
+class PantryRecipeSerializer(RecipeReadSerializer):
+    """Рецепт из поиска по продуктам с числом недостающих ингредиентов"""
+
+    missing_ingredients = serializers.IntegerField(read_only=True)
+
+
 class RecipeShortSerializer(ModelSerializer):
     class Meta:
         model = Recipe
@@ -236,6 +426,11 @@ class RecipeShortSerializer(ModelSerializer):
 
 
 class SubscribeSerializer(CustomUserSerializer):
+    collapsed_fields = {
+        "recipes": serializers.PrimaryKeyRelatedField(
+            many=True, read_only=True
+        ),
+    }
     recipes = RecipeShortSerializer(many=True, read_only=True)
     recipes_count = serializers.SerializerMethodField(read_only=True)
     is_subscribed = serializers.SerializerMethodField(read_only=True)
@@ -274,3 +469,81 @@ class SubscribeSerializer(CustomUserSerializer):
             "first_name",
             "last_name",
         )
+
+
+class SyncRecipeSerializer(ModelSerializer):
+    """Компактный рецепт для синхронизации: связи передаются по id"""
+
+    ingredients = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Recipe
+        fields = (
+            "id",
+            "author",
+            "name",
+            "text",
+            "image",
+            "cooking_time",
+            "servings",
+            "tags",
+            "ingredients",
+            "pub_date",
+            "updated_at",
+        )
+
+    def get_ingredients(self, obj):
+        return [[item.ingredient_id, item.amount] for item in obj.recipes.all()]
+
+
+class ShoppingCartSerializer(ModelSerializer):
+    """Порции рецепта в списке покупок"""
+
+    class Meta:
+        model = ShoppingCart
+        fields = ("multiplier",)
+
+
+class ShoppingCartUpdateSerializer(ShoppingCartSerializer):
+    """Изменение порций: multiplier обязателен, null - порции рецепта"""
+
+    class Meta(ShoppingCartSerializer.Meta):
+        extra_kwargs = {"multiplier": {"required": True}}
+
+
+class MealPlanSerializer(ModelSerializer):
+    """Сериализатор записи Плана питания"""
+
+    recipe = BulkPrimaryKeyRelatedField(queryset=Recipe.objects.all())
+
+    class Meta:
+        model = MealPlan
+        fields = ("id", "date", "slot", "recipe", "servings")
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data["recipe"] = RecipeShortSerializer(
+            instance.recipe, context=self.context
+        ).data
+        return data
+
+
+class ChangeEventSerializer(ModelSerializer):
+    class Meta:
+        model = ChangeEvent
+        fields = ("id", "entity", "entity_id", "action", "payload", "created")
+
+
+class ExportJobSerializer(ModelSerializer):
+    class Meta:
+        model = ExportJob
+        fields = ("id", "kind", "status", "error", "created", "finished")
+        read_only_fields = ("status", "error", "created", "finished")
+
+    def validate_kind(self, kind):
+        if (
+            kind == ExportJob.SHOPPING_LIST
+            and not self.context["request"].user.shopping_cart.exists()
+        ):
+            raise serializers.ValidationError("Список покупок пуст.")
+        return kind
@@ -1,31 +1,484 @@
+import hashlib
 import io
+import threading
 from datetime import datetime
 
+from django.conf import settings
+from django.contrib.postgres.expressions import ArraySubquery
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import (DecimalField, F, Func, IntegerField, OuterRef,
+                              Value,)
 from django.db.models.aggregates import Sum
+from django.db.models.functions import Cast, Coalesce, Round
 
-from recipes.models import RecipeIngredient
+from api.nutrition import get_cart_totals
+from recipes.events import CurrentXactId, record_events
+from recipes.models import (ChangeEvent, Favorited, MealPlan, Recipe,
+                            RecipeIngredient, ShoppingCart,)
+from users.models import Subscribe, User
+
+PAYLOAD_VERSION_KEY = "recipes:payload:version"
+AMOUNT_FIELD = DecimalField(max_digits=16, decimal_places=6)
+
+
+def canonical_unit(prefix="ingredient__"):
+    """Базовая единица ингредиента по справочнику MeasurementUnit.
+
+    Единицы, которых нет в справочнике, остаются как есть.
+    """
+    return Coalesce(
+        F(f"{prefix}unit__canonical"), F(f"{prefix}measurement_unit")
+    )
+
+
+def canonical_amount(prefix="ingredient__", amount="amount", scale=None):
+    """Количество ингредиента, пересчитанное в базовую единицу.
+
+    Считается в numeric, чтобы итог можно было точно округлить;
+    scale - необязательный множитель, например portions_scale().
+    """
+    result = Cast(
+        Coalesce(F(f"{prefix}unit__factor"), Value(1.0)), AMOUNT_FIELD
+    ) * Cast(F(amount), AMOUNT_FIELD)
+    if scale is not None:
+        result = result * scale
+    return result
+
+
+def portions_scale(portions, servings="recipe__servings"):
+    """Доля рецепта: порций к приготовлению / порций в рецепте."""
+    return Cast(portions, AMOUNT_FIELD) / Cast(F(servings), AMOUNT_FIELD)
+
+
+def total_amount(scale):
+    return Round(Sum(canonical_amount(scale=scale)), 2)
+
+
+def format_amount(amount):
+    return f"{amount:.2f}".rstrip("0").rstrip(".")
+
+
+def render_ingredients(ingredients):
+    return "\n".join(
+        f'- {ingredient["name"]} ({ingredient["unit"]})'
+        f' - {format_amount(ingredient["amount"])}'
+        for ingredient in ingredients
+    )
 
 
 def get_shopping_list(user):
     ingredients = (
         RecipeIngredient.objects.filter(recipe__shopping_cart__user=user)
-        .values("ingredient__name", "ingredient__measurement_unit")
-        .annotate(amount=Sum("amount"))
+        .values(name=F("ingredient__name"), unit=canonical_unit())
+        .annotate(
+            amount=total_amount(
+                portions_scale(
+                    Coalesce(
+                        "recipe__shopping_cart__multiplier",
+                        "recipe__servings",
+                        output_field=AMOUNT_FIELD,
+                    )
+                )
+            )
+        )
+        .order_by("name", "unit")
     )
     today = datetime.today()
     shopping_list = (
         f"Список покупок для: {user.get_full_name()}\n\n"
         f"Дата: {today:%Y-%m-%d}\n\n"
     )
-    shopping_list += "\n".join(
-        [
-            f'- {ingredient["ingredient__name"]} '
-            f'({ingredient["ingredient__measurement_unit"]})'
-            f' - {ingredient["amount"]}'
-            for ingredient in ingredients
-        ]
+    shopping_list += render_ingredients(ingredients)
+    totals = get_cart_totals(user)
+    shopping_list += (
+        f"\n\nПищевая ценность: {totals['calories']} ккал, "
+        f"белки {totals['proteins']} г, жиры {totals['fats']} г, "
+        f"углеводы {totals['carbohydrates']} г"
+        f"\nОриентировочная стоимость: {totals['price']}"
     )
     shopping_list += f"\n\nFoodgram ({today:%Y}) желает Вам приятных покупок!"
 
     shopping_list_bytes = io.BytesIO(shopping_list.encode("utf-8"))
     return shopping_list_bytes
+
+
+def get_meal_plan_list(user, start, end):
+    """Список покупок на период плана питания.
+
+    Каждая запись плана - отдельная строка соединения, поэтому рецепт,
+    запланированный несколько раз, учитывается столько же раз с весом
+    порций плана к порциям рецепта. Итоги считаются одним агрегатом Sum.
+    """
+    ingredients = (
+        RecipeIngredient.objects.filter(
+            recipe__meal_plans__user=user,
+            recipe__meal_plans__date__range=(start, end),
+        )
+        .values(name=F("ingredient__name"), unit=canonical_unit())
+        .annotate(
+            amount=total_amount(
+                portions_scale(F("recipe__meal_plans__servings"))
+            )
+        )
+        .order_by("name", "unit")
+    )
+    shopping_list = (
+        f"Список покупок для: {user.get_full_name()}\n\n"
+        f"План питания: {start:%Y-%m-%d} - {end:%Y-%m-%d}\n\n"
+    )
+    shopping_list += render_ingredients(ingredients)
+    shopping_list += (
+        f"\n\nFoodgram ({start:%Y}) желает Вам приятных покупок!"
+    )
+    return io.BytesIO(shopping_list.encode("utf-8"))
+
+
+@transaction.atomic
+def replace_meal_plan(user, start, end, entries):
+    """Заменяет план пользователя на период одним пакетом."""
+    MealPlan.objects.filter(user=user, date__range=(start, end)).delete()
+    return MealPlan.objects.bulk_create(
+        MealPlan(user=user, **entry) for entry in entries
+    )
+
+
+def feed_head_key(user_id):
+    return f"feed:head:{user_id}"
+
+
+def get_feed_head(user, queryset, size):
+    """Возвращает id рецептов первой страницы ленты из кэша.
+
+    Кэшируется page_size + 1 id, чтобы пагинатор мог определить
+    наличие следующей страницы. При отключенном кэше возвращает None.
+    """
+    if not settings.FEED_CACHE_TIMEOUT:
+        return None
+    key = feed_head_key(user.id)
+    head = cache.get(key)
+    if head is None or head["size"] != size:
+        head = {
+            "size": size,
+            "ids": list(queryset.values_list("pk", flat=True)[: size + 1]),
+        }
+        cache.set(key, head, settings.FEED_CACHE_TIMEOUT)
+    return head["ids"]
+
+
+def invalidate_feed_heads(user_ids):
+    cache.delete_many([feed_head_key(user_id) for user_id in user_ids])
+
+
+def shared_payload_key(request):
+    """Ключ общего для всех пользователей ответа со списком рецептов.
+
+    Зависит только от адреса запроса и версии данных, поэтому
+    анонимные и авторизованные пользователи получают одну запись кэша.
+    """
+    version = cache.get(PAYLOAD_VERSION_KEY, 0)
+    digest = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f"recipes:payload:{version}:{digest}"
+
+
+def reset_shared_payloads():
+    """Делает устаревшими все закэшированные ответы с рецептами."""
+    if not cache.add(PAYLOAD_VERSION_KEY, 1, None):
+        cache.incr(PAYLOAD_VERSION_KEY)
+
+
+def get_user_state(user, recipe_ids, author_ids):
+    """Избранное, список покупок и подписки пользователя для страницы.
+
+    Все три набора читаются одним запросом UNION ALL.
+    """
+    state = {"favorited": set(), "shopping_cart": set(), "subscribed": set()}
+    if not user.is_authenticated or not (recipe_ids or author_ids):
+        return state
+    rows = (
+        Favorited.objects.filter(user=user, recipe_id__in=recipe_ids)
+        .annotate(kind=Value("favorited"))
+        .values_list("kind", "recipe_id")
+        .order_by()
+        .union(
+            ShoppingCart.objects.filter(user=user, recipe_id__in=recipe_ids)
+            .annotate(kind=Value("shopping_cart"))
+            .values_list("kind", "recipe_id")
+            .order_by(),
+            Subscribe.objects.filter(user=user, author_id__in=author_ids)
+            .annotate(kind=Value("subscribed"))
+            .values_list("kind", "author_id")
+            .order_by(),
+            all=True,
+        )
+    )
+    for kind, object_id in rows:
+        state[kind].add(object_id)
+    return state
+
+
+def overlay_user_state(user, data):
+    """Проставляет флаги пользователя в общий ответ с рецептами.
+
+    Принимает рецепт, список рецептов или страницу пагинатора.
+    """
+    if isinstance(data, dict) and "results" in data:
+        recipes = data["results"]
+    elif isinstance(data, dict):
+        recipes = [data]
+    else:
+        recipes = data
+    if not user.is_authenticated:
+        return data
+    authors = {
+        recipe["author"]["id"]
+        for recipe in recipes
+        if isinstance(recipe["author"], dict)
+    }
+    state = get_user_state(
+        user, {recipe["id"] for recipe in recipes}, authors
+    )
+    for recipe in recipes:
+        recipe["is_favorited"] = recipe["id"] in state["favorited"]
+        recipe["is_in_shopping_cart"] = (
+            recipe["id"] in state["shopping_cart"]
+        )
+        # Автор без expand отдается id, флаг подписки ставить некуда.
+        if isinstance(recipe["author"], dict):
+            recipe["author"]["is_subscribed"] = (
+                recipe["author"]["id"] in state["subscribed"]
+            )
+    return data
+
+
+_pending_ingredient_ids = threading.local()
+
+
+def sync_ingredient_ids(recipe_ids):
+    """Обновляет массив id ингредиентов рецептов одним запросом."""
+    recipe_ids = set(recipe_ids)
+    pending = getattr(_pending_ingredient_ids, "recipe_ids", None)
+    if pending:
+        pending.difference_update(recipe_ids)
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        ingredient_ids=ArraySubquery(
+            RecipeIngredient.objects.filter(recipe=OuterRef("pk"))
+            .order_by("ingredient_id")
+            .values("ingredient_id")
+        )
+    )
+
+
+def sync_ingredient_ids_on_commit(recipe_id):
+    """Обновляет ingredient_ids рецепта после коммита транзакции.
+
+    id копятся за транзакцию, и все рецепты обновляются одним
+    запросом, сколько бы строк ни было удалено. id из откаченной
+    транзакции обновятся вместе со следующими, это безвредно.
+    """
+    pending = _pending_ingredient_ids.__dict__.setdefault("recipe_ids", set())
+    pending.add(recipe_id)
+    transaction.on_commit(flush_ingredient_ids)
+
+
+def flush_ingredient_ids():
+    recipe_ids = _pending_ingredient_ids.__dict__.pop("recipe_ids", None)
+    if recipe_ids:
+        sync_ingredient_ids(recipe_ids)
+
+
+EVENT_COLUMNS = (
+    "(entity, entity_id, action, payload, user_id, created, xact_id)"
+)
+LIST_ENTITIES = {
+    Favorited: ChangeEvent.FAVORITE,
+    ShoppingCart: ChangeEvent.SHOPPING_CART,
+}
+
+
+def upsert_relation(
+    model, target, field, columns, user, target_id, entity, values=None
+):
+    """Создает связь пользователя с объектом одним запросом.
+
+    INSERT ... ON CONFLICT DO NOTHING не нарушает уникальность при
+    повторе, а событие в журнал изменений пишется тем же оператором.
+    values - значения дополнительных столбцов связи.
+    Возвращает объект с признаком created либо None, если его нет.
+    """
+    values = values or {}
+    insert_columns, insert_values = f"user_id, {field}", "%s, id"
+    if any(item.name == "created" for item in model._meta.concrete_fields):
+        insert_columns += ", created"
+        insert_values += ", now()"
+    for column in values:
+        insert_columns += f", {column}"
+        insert_values += ", %s"
+    sql = f"""
+        WITH target AS (
+            SELECT {columns} FROM {target._meta.db_table} WHERE id = %s
+        ), inserted AS (
+            INSERT INTO {model._meta.db_table} ({insert_columns})
+            SELECT {insert_values} FROM target
+            ON CONFLICT DO NOTHING
+            RETURNING user_id, {field}
+        ), event AS (
+            INSERT INTO {ChangeEvent._meta.db_table} {EVENT_COLUMNS}
+            SELECT %s, {field}, %s, '{{}}', user_id, now(),
+                {CurrentXactId.template} FROM inserted
+        )
+        SELECT target.*, EXISTS (SELECT FROM inserted) AS created
+        FROM target
+    """
+    return next(
+        iter(
+            target.objects.raw(
+                sql,
+                (
+                    target_id,
+                    user.pk,
+                    *values.values(),
+                    entity,
+                    ChangeEvent.CREATED,
+                ),
+            )
+        ),
+        None,
+    )
+
+
+def delete_relation(model, field, user, target_id, entity):
+    """Удаляет связь и пишет событие одним оператором.
+
+    Возвращает False, если удалять было нечего.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH deleted AS (
+                DELETE FROM {model._meta.db_table}
+                WHERE user_id = %s AND {field} = %s
+                RETURNING user_id, {field}
+            )
+            INSERT INTO {ChangeEvent._meta.db_table} {EVENT_COLUMNS}
+            SELECT %s, {field}, %s, '{{}}', user_id, now(),
+                {CurrentXactId.template} FROM deleted
+            RETURNING id
+            """,
+            (user.pk, target_id, entity, ChangeEvent.DELETED),
+        )
+        return cursor.fetchone() is not None
+
+
+def add_to_list(model, user, recipe_id, **values):
+    """Добавляет рецепт в избранное или список покупок."""
+    return upsert_relation(
+        model,
+        Recipe,
+        "recipe_id",
+        "id, name, image, cooking_time",
+        user,
+        recipe_id,
+        LIST_ENTITIES[model],
+        values,
+    )
+
+
+def remove_from_list(model, user, recipe_id):
+    return delete_relation(
+        model, "recipe_id", user, recipe_id, LIST_ENTITIES[model]
+    )
+
+
+def add_subscription(user, author_id):
+    author = upsert_relation(
+        Subscribe,
+        User,
+        "author_id",
+        "id, email, username, first_name, last_name",
+        user,
+        author_id,
+        ChangeEvent.SUBSCRIPTION,
+    )
+    if author is not None and author.created:
+        invalidate_feed_heads((user.pk,))
+    return author
+
+
+def remove_subscription(user, author_id):
+    deleted = delete_relation(
+        Subscribe, "author_id", user, author_id, ChangeEvent.SUBSCRIPTION
+    )
+    if deleted:
+        invalidate_feed_heads((user.pk,))
+    return deleted
+
+
+@transaction.atomic
+def bulk_create_recipes(author, items):
+    """Создает пакет проверенных рецептов тремя bulk_create.
+
+    Сигналы при этом не срабатывают, поэтому производные данные
+    (ingredient_ids, журнал изменений, кэши) обновляются здесь же.
+    """
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=item["name"],
+            text=item["text"],
+            cooking_time=item["cooking_time"],
+            servings=item.get("servings", 1),
+            image=item["image"],
+            ingredient_ids=sorted(
+                ingredient["id"] for ingredient in item["ingredients"]
+            ),
+        )
+        for item in items
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag.pk)
+        for recipe, item in zip(recipes, items)
+        for tag in item["tags"]
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe_id=recipe.pk,
+            ingredient_id=ingredient["id"],
+            amount=ingredient["amount"],
+        )
+        for recipe, item in zip(recipes, items)
+        for ingredient in item["ingredients"]
+    )
+    record_events(
+        ChangeEvent.RECIPE,
+        [recipe.pk for recipe in recipes],
+        ChangeEvent.CREATED,
+    )
+    transaction.on_commit(reset_shared_payloads)
+    transaction.on_commit(
+        lambda: invalidate_feed_heads(
+            Subscribe.objects.filter(author=author).values_list(
+                "user_id", flat=True
+            )
+        )
+    )
+    return recipes
+
+
+class MissingIngredientsCount(Func):
+    """Количество ингредиентов рецепта, которых нет в переданном наборе."""
+
+    template = (
+        "cardinality(ARRAY(SELECT unnest(%s) EXCEPT SELECT unnest(%s)))"
+    )
+    arity = 2
+    output_field = IntegerField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        ingredients, pantry = self.get_source_expressions()
+        ingredients_sql, ingredients_params = compiler.compile(ingredients)
+        pantry_sql, pantry_params = compiler.compile(pantry)
+        return (
+            self.template % (ingredients_sql, pantry_sql),
+            (*ingredients_params, *pantry_params),
+        )
@@ -0,0 +1,108 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete,)
+from django.dispatch import receiver
+
+from api.nutrition import reset_catalogue
+from api.serializers import refresh_recipe_cards
+from api.services import (invalidate_feed_heads, reset_shared_payloads,
+                          sync_ingredient_ids, sync_ingredient_ids_on_commit,)
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import Subscribe, User
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def reset_followers_feed(sender, instance, created=True, **kwargs):
+    """Сбрасывает голову ленты подписчиков при публикации рецепта."""
+    if not created:
+        return
+    invalidate_feed_heads(
+        Subscribe.objects.filter(author_id=instance.author_id).values_list(
+            "user_id", flat=True
+        )
+    )
+
+
+@receiver(post_save, sender=Subscribe)
+@receiver(post_delete, sender=Subscribe)
+def reset_subscriber_feed(sender, instance, **kwargs):
+    invalidate_feed_heads((instance.user_id,))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def reset_nutrition_catalogue(sender, **kwargs):
+    reset_catalogue()
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def update_recipe_ingredient_ids(sender, instance, **kwargs):
+    sync_ingredient_ids((instance.recipe_id,))
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def remove_recipe_ingredient_id(sender, instance, origin=None, **kwargs):
+    """Обновляет рецепт после коммита, один раз на транзакцию.
+
+    При удалении самого рецепта обновлять нечего.
+    """
+    if isinstance(origin, Recipe):
+        return
+    sync_ingredient_ids_on_commit(instance.recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=User)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def reset_recipe_payloads(sender, **kwargs):
+    """Сбрасывает общий кэш рецептов при изменении их содержимого."""
+    reset_shared_payloads()
+
+
+@receiver(post_save, sender=User)
+def reset_author_payloads(sender, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {"last_login"}:
+        return
+    reset_shared_payloads()
+
+
+def card_recipe_ids(instance):
+    """id рецептов, в карточках которых показан тег, ингредиент или автор."""
+    if isinstance(instance, Tag):
+        return Recipe.objects.filter(tags=instance).values_list("pk", flat=True)
+    if isinstance(instance, Ingredient):
+        return RecipeIngredient.objects.filter(
+            ingredient=instance
+        ).values_list("recipe_id", flat=True)
+    return instance.recipes.values_list("pk", flat=True)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=User)
+def refresh_related_cards(
+    sender, instance, created, update_fields=None, **kwargs
+):
+    """Перестраивает карточки рецептов при изменении связанных данных."""
+    if created or update_fields and set(update_fields) == {"last_login"}:
+        return
+    refresh_recipe_cards(card_recipe_ids(instance))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_card_recipes(sender, instance, **kwargs):
+    instance._card_recipe_ids = list(card_recipe_ids(instance))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def refresh_deleted_cards(sender, instance, **kwargs):
+    refresh_recipe_cards(getattr(instance, "_card_recipe_ids", ()))
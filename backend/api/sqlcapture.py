@@ -0,0 +1,176 @@
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.response import TemplateResponse
+from django.utils import timezone
+
+NORMALIZE_RULES = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\s+"), " "),
+    (re.compile(r"\bIN \(\?(?:, \?)*\)"), "IN (...)"),
+    (re.compile(r"(\(\?(?:, \?)*\))(?:, \1)+"), r"\1, ..."),
+)
+
+slow_queries = deque(maxlen=settings.SQL_SLOW_LOG_SIZE)
+slow_queries_lock = threading.Lock()
+
+
+def normalize_sql(sql):
+    """Текст запроса без значений: одинаковые запросы совпадают."""
+    for pattern, replacement in NORMALIZE_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def call_site():
+    """Ближайшая к запросу строка кода проекта вне библиотек."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(settings.BASE_DIR)
+            and "site-packages" not in filename
+            and filename != __file__
+        ):
+            return "{}:{} {}".format(
+                filename[len(settings.BASE_DIR) + 1:],
+                frame.f_lineno,
+                frame.f_code.co_name,
+            )
+        frame = frame.f_back
+    return ""
+
+
+def explain(connection, sql, params):
+    """План EXPLAIN (ANALYZE, BUFFERS) для уже выполненного SELECT.
+
+    Запрос выполняется еще раз отдельным курсором драйвера в обход
+    execute_wrapper. Внутри транзакции используется точка сохранения,
+    чтобы ошибка EXPLAIN не прервала транзакцию запроса.
+    """
+    savepoint = connection.in_atomic_block
+    with connection.connection.cursor() as cursor:
+        try:
+            if savepoint:
+                cursor.execute("SAVEPOINT sqlcapture_explain")
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+            if savepoint:
+                cursor.execute("RELEASE SAVEPOINT sqlcapture_explain")
+            return plan
+        except Exception as error:
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT sqlcapture_explain")
+            return f"EXPLAIN не выполнен: {error!r}"
+
+
+def can_explain(sql, many):
+    sql = sql.lstrip().upper()
+    return not many and sql.startswith("SELECT") and " FOR UPDATE" not in sql
+
+
+class QueryCapture:
+    """execute_wrapper, записывающий запросы одного HTTP-запроса.
+
+    Запросы дольше SQL_SLOW_QUERY_MS попадают в общий журнал медленных
+    запросов, а SELECT из них с вероятностью SQL_EXPLAIN_SAMPLE_RATE
+    получает план выполнения.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.queries = []
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            query = {
+                "sql": normalize_sql(sql),
+                "duration": duration,
+                "site": call_site(),
+            }
+            self.queries.append(query)
+            if duration >= settings.SQL_SLOW_QUERY_MS:
+                self.record_slow(query, sql, params, many, context)
+
+    def record_slow(self, query, sql, params, many, context):
+        entry = {
+            **query,
+            "time": timezone.now(),
+            "method": self.request.method,
+            "path": self.request.get_full_path(),
+            "plan": "",
+        }
+        if (
+            can_explain(sql, many)
+            and sys.exc_info()[0] is None
+            and random.random() < settings.SQL_EXPLAIN_SAMPLE_RATE
+        ):
+            entry["plan"] = explain(context["connection"], sql, params)
+        self.slow.append(entry)
+        with slow_queries_lock:
+            slow_queries.append(entry)
+
+    def finish(self):
+        """Дописывает в медленные запросы число повторов за HTTP-запрос."""
+        counts = Counter(query["sql"] for query in self.queries)
+        for entry in self.slow:
+            entry["repeats"] = counts[entry["sql"]]
+        return len(self.queries), sum(q["duration"] for q in self.queries)
+
+
+class SQLCaptureMiddleware:
+    """Запись SQL-запросов каждого HTTP-запроса (SQL_CAPTURE).
+
+    Число и суммарное время запросов отдаются в заголовке
+    Server-Timing, медленные запросы видны сотрудникам на странице
+    admin/slow-queries/. Журнал хранится в памяти процесса.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SQL_CAPTURE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        capture = QueryCapture(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(capture))
+            response = self.get_response(request)
+        count, duration = capture.finish()
+        response["Server-Timing"] = (
+            f'db;dur={duration:.1f};desc="{count} SQL"'
+        )
+        return response
+
+
+def slow_queries_view(request):
+    """Журнал медленных SQL-запросов для администраторов."""
+    with slow_queries_lock:
+        entries = list(reversed(slow_queries))
+    context = {
+        **admin.site.each_context(request),
+        "title": "Медленные SQL-запросы",
+        "entries": entries,
+        "enabled": settings.SQL_CAPTURE,
+        "threshold": settings.SQL_SLOW_QUERY_MS,
+        "sample_rate": settings.SQL_EXPLAIN_SAMPLE_RATE,
+        "size": settings.SQL_SLOW_LOG_SIZE,
+    }
+    return TemplateResponse(request, "admin/slow_queries.html", context)
@@ -0,0 +1,70 @@
+from django.db.models import Max, Q
+
+from recipes.events import events_after, settled_events
+from recipes.models import ChangeEvent, Ingredient, Recipe, Tag
+
+SYNC_ENTITIES = {
+    ChangeEvent.RECIPE: "recipes",
+    ChangeEvent.TAG: "tags",
+    ChangeEvent.INGREDIENT: "ingredients",
+    ChangeEvent.FAVORITE: "favorites",
+    ChangeEvent.SHOPPING_CART: "shopping_cart",
+}
+CATALOGUE = {
+    ChangeEvent.RECIPE: Recipe.objects.prefetch_related("tags", "recipes"),
+    ChangeEvent.TAG: Tag.objects.all(),
+    ChangeEvent.INGREDIENT: Ingredient.objects.all(),
+}
+
+
+def user_events(user):
+    """Завершенные события справочников и личных списков пользователя."""
+    visible = Q(user_id__isnull=True)
+    if user.is_authenticated:
+        visible |= Q(user_id=user.pk)
+    return settled_events().filter(visible, entity__in=SYNC_ENTITIES)
+
+
+def get_sync_token(user):
+    return user_events(user).aggregate(token=Max("xact_id"))["token"] or 0
+
+
+def get_changes(user, token, batch_size):
+    """Сворачивает события после token в изменения по сущностям.
+
+    Для каждого объекта остается только последнее действие: рецепт,
+    созданный и удаленный внутри пачки, попадет только в deleted.
+    Возвращает (изменения, новый token, есть ли еще события).
+    """
+    events, token, has_more = events_after(
+        user_events(user).only("xact_id", "entity", "entity_id", "action"),
+        token,
+        batch_size,
+    )
+    last_action = {}
+    for event in events:
+        last_action[event.entity, event.entity_id] = event.action
+    changes = {
+        entity: {"updated": [], "deleted": []} for entity in CATALOGUE
+    }
+    changes.update(
+        (entity, {"added": [], "removed": []})
+        for entity in SYNC_ENTITIES
+        if entity not in CATALOGUE
+    )
+    for (entity, entity_id), action in last_action.items():
+        if entity in CATALOGUE:
+            key = "deleted" if action == ChangeEvent.DELETED else "updated"
+        else:
+            key = "removed" if action == ChangeEvent.DELETED else "added"
+        changes[entity][key].append(entity_id)
+    for entity, queryset in CATALOGUE.items():
+        ids = changes[entity]["updated"]
+        objects = queryset.in_bulk(ids)
+        changes[entity]["updated"] = [objects[pk] for pk in ids if pk in objects]
+        changes[entity]["deleted"].extend(pk for pk in ids if pk not in objects)
+    return (
+        {SYNC_ENTITIES[entity]: value for entity, value in changes.items()},
+        token,
+        has_more,
+    )
@@ -0,0 +1,745 @@
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from rest_framework.authtoken.models import Token
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.exports import (RECLAIMED, claim_jobs, data_fingerprint,
+                         recipes_state, render_recipes, run_job, touch_jobs,)
+from api.services import MissingIngredientsCount, get_shopping_list
+from api.throttling import CacheBucketBackend
+from recipes.events import dispatch, record_events
+from recipes.models import (ChangeEvent, ExportJob, Favorited, Ingredient,
+                            MeasurementUnit, Recipe, RecipeIngredient,
+                            RecipeSimilarity, ShoppingCart, Tag,)
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+IMAGE = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA"
+    "DUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+
+def create_recipe(author, name, **fields):
+    return Recipe.objects.create(
+        author=author,
+        name=name,
+        text="Описание",
+        cooking_time=10,
+        image="recipes/images/test.png",
+        **fields,
+    )
+
+
+class IngredientsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        MeasurementUnit.objects.get_or_create(
+            name="кг", defaults={"canonical": "г", "factor": 1000}
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"Ингредиент {i}", measurement_unit="кг")
+            for i in range(10)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_list_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/ingredients/")
+        self.assertEqual(len(response.data), 10)
+        self.assertNotIn("unit", response.data[0])
+
+
+class SimilarRecipesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username="author", email="author@example.com", password="pass"
+        )
+        cls.recipe = create_recipe(author, "Борщ")
+        cls.similar = create_recipe(author, "Щи")
+        RecipeSimilarity.objects.create(
+            recipe=cls.recipe, similar=cls.similar, score=0.5
+        )
+
+    def test_similar(self):
+        response = self.client.get(f"/api/recipes/{self.recipe.pk}/similar/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item["id"] for item in response.data], [self.similar.pk]
+        )
+
+    def test_unknown_recipe(self):
+        for pk in ("abc", self.similar.pk + 100):
+            response = self.client.get(f"/api/recipes/{pk}/similar/")
+            self.assertEqual(response.status_code, 404)
+
+
+class TrendingTest(TestCase):
+    """Рецепты с равным рейтингом не теряются между страницами."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username="author", email="author@example.com", password="pass"
+        )
+        cls.recipes = [create_recipe(author, f"Рецепт {i}") for i in range(4)]
+        for recipe in cls.recipes:
+            Favorited.objects.create(user=author, recipe=recipe)
+        Favorited.objects.update(created=Favorited.objects.first().created)
+        call_command("refreshtrending", stdout=io.StringIO())
+
+    def trending_ids(self):
+        ids = []
+        url = "/api/recipes/trending/?limit=1"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item["id"] for item in response.data["results"])
+            url = response.data["next"]
+        return ids
+
+    def test_pages_cover_ties(self):
+        self.assertEqual(
+            self.trending_ids(), [recipe.pk for recipe in self.recipes]
+        )
+
+    def test_refresh_moves_positions(self):
+        reader = User.objects.create_user(
+            username="reader", email="reader@example.com", password="pass"
+        )
+        Favorited.objects.create(user=reader, recipe=self.recipes[-1])
+        call_command("refreshtrending", stdout=io.StringIO())
+        self.assertEqual(
+            self.trending_ids(),
+            [recipe.pk for recipe in self.recipes[-1:] + self.recipes[:-1]],
+        )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class SyncTest(TransactionTestCase):
+    """Клиент с token получает из /api/sync/ ровно свои изменения.
+
+    События видны только после коммита их транзакции, поэтому каждый
+    запрос здесь коммитится, а не откатывается вместе с тестом.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="client", email="client@example.com", password="pass"
+        )
+        self.other = User.objects.create_user(
+            username="other", email="other@example.com", password="pass"
+        )
+        self.tag = Tag.objects.create(
+            name="Обед", color="#FF0000", slug="lunch"
+        )
+        self.ingredient = Ingredient.objects.create(
+            name="Свекла", measurement_unit="г"
+        )
+        self.recipe = create_recipe(self.other, "Борщ")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.token = self.client.get("/api/sync/").data["token"]
+
+    def delta(self, client=None):
+        """Изменения после текущего token; token должен сдвинуться."""
+        response = (client or self.client).get(
+            "/api/sync/", {"token": self.token}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data["reset"])
+        self.assertGreater(response.data["token"], self.token)
+        self.token = response.data["token"]
+        return response.data
+
+    def assertNoChanges(self):
+        response = self.client.get("/api/sync/", {"token": self.token})
+        self.assertEqual(response.data["token"], self.token)
+        for name in ("recipes", "tags", "ingredients"):
+            self.assertEqual(response.data[name]["updated"], [])
+            self.assertEqual(response.data[name]["deleted"], [])
+        for name in ("favorites", "shopping_cart"):
+            self.assertEqual(response.data[name]["added"], [])
+            self.assertEqual(response.data[name]["removed"], [])
+
+    def test_recipe_lifecycle(self):
+        payload = {
+            "name": "Щи",
+            "text": "Описание",
+            "cooking_time": 30,
+            "image": IMAGE,
+            "tags": [self.tag.pk],
+            "ingredients": [{"id": self.ingredient.pk, "amount": 200}],
+        }
+        response = self.client.post("/api/recipes/", payload, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("card_json", response.data)
+        pk = response.data["id"]
+        recipes = self.delta()["recipes"]
+        self.assertEqual([item["id"] for item in recipes["updated"]], [pk])
+        self.assertEqual(recipes["deleted"], [])
+
+        response = self.client.patch(
+            f"/api/recipes/{pk}/",
+            {**payload, "name": "Кислые щи"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("card_json", response.data)
+        recipes = self.delta()["recipes"]
+        self.assertEqual(
+            [item["name"] for item in recipes["updated"]], ["Кислые щи"]
+        )
+
+        response = self.client.delete(f"/api/recipes/{pk}/")
+        self.assertEqual(response.status_code, 204)
+        recipes = self.delta()["recipes"]
+        self.assertEqual(recipes["updated"], [])
+        self.assertEqual(recipes["deleted"], [pk])
+        self.assertNoChanges()
+
+    def test_created_and_deleted_in_one_delta(self):
+        recipe = create_recipe(self.user, "Окрошка")
+        pk = recipe.pk
+        recipe.delete()
+        recipes = self.delta()["recipes"]
+        self.assertEqual(recipes["updated"], [])
+        self.assertEqual(recipes["deleted"], [pk])
+
+    def test_favorite_toggle(self):
+        url = f"/api/recipes/{self.recipe.pk}/favorite/"
+        self.assertEqual(self.client.post(url).status_code, 201)
+        favorites = self.delta()["favorites"]
+        self.assertEqual(favorites, {"added": [self.recipe.pk], "removed": []})
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        favorites = self.delta()["favorites"]
+        self.assertEqual(favorites, {"added": [], "removed": [self.recipe.pk]})
+        self.assertNoChanges()
+
+    def test_shopping_cart_toggle(self):
+        url = f"/api/recipes/{self.recipe.pk}/shopping_cart/"
+        self.assertEqual(self.client.post(url).status_code, 201)
+        cart = self.delta()["shopping_cart"]
+        self.assertEqual(cart, {"added": [self.recipe.pk], "removed": []})
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        cart = self.delta()["shopping_cart"]
+        self.assertEqual(cart, {"added": [], "removed": [self.recipe.pk]})
+        self.assertNoChanges()
+
+    def test_shopping_cart_multiplier(self):
+        url = f"/api/recipes/{self.recipe.pk}/shopping_cart/"
+        self.assertEqual(self.client.patch(url, {}).status_code, 404)
+        self.client.post(url)
+        self.delta()
+        self.assertEqual(self.client.patch(url, {}).status_code, 400)
+        self.assertNoChanges()
+
+        response = self.client.patch(url, {"multiplier": "3"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.user.shopping_cart.get().multiplier, Decimal("3")
+        )
+        cart = self.delta()["shopping_cart"]
+        self.assertEqual(cart, {"added": [self.recipe.pk], "removed": []})
+
+    def test_recipe_servings(self):
+        recipe = create_recipe(self.user, "Солянка")
+        self.delta()
+        response = self.client.patch(
+            f"/api/recipes/{recipe.pk}/", {"servings": 6}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.servings, 6)
+        recipes = self.delta()["recipes"]
+        self.assertEqual(
+            [item["servings"] for item in recipes["updated"]], [6]
+        )
+
+    def test_other_client_lists_are_private(self):
+        other = APIClient()
+        other.force_authenticate(self.other)
+        other.post(f"/api/recipes/{self.recipe.pk}/favorite/")
+        other.post(f"/api/recipes/{self.recipe.pk}/shopping_cart/")
+        self.assertNoChanges()
+        self.assertEqual(
+            self.delta(other)["favorites"]["added"], [self.recipe.pk]
+        )
+
+    def test_catalogue_changes(self):
+        self.tag.name = "Ужин"
+        self.tag.save()
+        ingredient_id = self.ingredient.pk
+        self.ingredient.delete()
+        data = self.delta()
+        self.assertEqual(
+            [item["name"] for item in data["tags"]["updated"]], ["Ужин"]
+        )
+        self.assertEqual(data["ingredients"]["deleted"], [ingredient_id])
+
+    def test_ingredient_payload_has_no_unit(self):
+        self.ingredient.price = 10
+        self.ingredient.save()
+        updated = self.delta()["ingredients"]["updated"]
+        self.assertEqual(len(updated), 1)
+        self.assertNotIn("unit", updated[0])
+
+    def test_open_transaction_is_hidden(self):
+        with transaction.atomic():
+            self.tag.name = "Ужин"
+            self.tag.save()
+            self.assertNoChanges()
+        self.assertEqual(len(self.delta()["tags"]["updated"]), 1)
+
+    def test_changes_page_keeps_transactions_whole(self):
+        record_events(ChangeEvent.TAG, [1, 2, 3], ChangeEvent.UPDATED)
+        record_events(ChangeEvent.TAG, [4], ChangeEvent.UPDATED)
+        response = self.client.get(
+            "/api/changes/", {"since": self.token, "limit": 2}
+        )
+        self.assertTrue(response.data["has_more"])
+        self.assertEqual(
+            [item["entity_id"] for item in response.data["results"]],
+            [1, 2, 3],
+        )
+        response = self.client.get(
+            "/api/changes/", {"since": response.data["next"], "limit": 2}
+        )
+        self.assertFalse(response.data["has_more"])
+        self.assertEqual(
+            [item["entity_id"] for item in response.data["results"]], [4]
+        )
+
+
+class ShoppingListTest(TestCase):
+    """Список покупок пересчитывается на выбранное число порций."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="cook", email="cook@example.com", password="pass"
+        )
+        cls.beet = Ingredient.objects.create(
+            name="Свекла", measurement_unit="шт"
+        )
+        cls.salt = Ingredient.objects.create(
+            name="Соль", measurement_unit="щепотка"
+        )
+        cls.borsch = create_recipe(cls.user, "Борщ", servings=3)
+        cls.soup = create_recipe(cls.user, "Суп", servings=3)
+        RecipeIngredient.objects.create(
+            recipe=cls.borsch, ingredient=cls.beet, amount=2
+        )
+        RecipeIngredient.objects.create(
+            recipe=cls.borsch, ingredient=cls.salt, amount=1
+        )
+        RecipeIngredient.objects.create(
+            recipe=cls.soup, ingredient=cls.beet, amount=1
+        )
+
+    def lines(self):
+        content = get_shopping_list(self.user).getvalue().decode()
+        return [line for line in content.splitlines() if line.startswith("- ")]
+
+    def test_null_multiplier_uses_recipe_servings(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.borsch)
+        self.assertEqual(
+            self.lines(), ["- Свекла (шт) - 2", "- Соль (щепотка) - 1"]
+        )
+
+    def test_multiplier_scales_and_rounds(self):
+        ShoppingCart.objects.create(
+            user=self.user, recipe=self.borsch, multiplier=Decimal("2")
+        )
+        ShoppingCart.objects.create(
+            user=self.user, recipe=self.soup, multiplier=Decimal("1")
+        )
+        # 2 * 2/3 + 1 * 1/3 = 1.333... + 0.333...: округляется сумма,
+        # а не слагаемые, поэтому 1.67, а не 1.66.
+        self.assertEqual(
+            self.lines(), ["- Свекла (шт) - 1.67", "- Соль (щепотка) - 0.67"]
+        )
+
+
+class IdempotencyTest(TestCase):
+    """Повтор с тем же Idempotency-Key возвращает сохраненный ответ."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="cook", email="cook@example.com", password="pass"
+        )
+        cls.recipe = create_recipe(cls.user, "Борщ")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, path, data, key="key-1"):
+        return self.client.post(
+            path, data, format="json", HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_replays_same_request(self):
+        path = f"/api/recipes/{self.recipe.pk}/shopping_cart/"
+        first = self.post(path, {"multiplier": "2"})
+        self.assertEqual(first.status_code, 201)
+        second = self.post(path, {"multiplier": "2"})
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(second.data, first.data)
+
+    def test_rejects_key_reused_with_other_payload(self):
+        path = f"/api/recipes/{self.recipe.pk}/shopping_cart/"
+        self.assertEqual(self.post(path, {"multiplier": "2"}).status_code, 201)
+        self.assertEqual(self.post(path, {"multiplier": "3"}).status_code, 422)
+        favorite = f"/api/recipes/{self.recipe.pk}/favorite/"
+        self.assertEqual(self.post(favorite, {}).status_code, 422)
+        self.assertEqual(
+            self.post(favorite, {}, key="key-2").status_code, 201
+        )
+
+
+class RecipesExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username="author", email="author@example.com", password="pass"
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name="Свекла", measurement_unit="г"
+        )
+        for name in ("Борщ", "Винегрет"):
+            RecipeIngredient.objects.create(
+                recipe=create_recipe(cls.author, name),
+                ingredient=cls.ingredient,
+                amount=100,
+            )
+
+    def test_render_streams_json_lines(self):
+        with tempfile.TemporaryFile() as file:
+            render_recipes(self.author, file)
+            file.seek(0)
+            rows = [json.loads(line) for line in file]
+        self.assertEqual([row["name"] for row in rows], ["Борщ", "Винегрет"])
+        self.assertEqual(rows[0]["ingredients"][0]["name"], "Свекла")
+
+    def claim(self):
+        job = ExportJob.objects.create(
+            user=self.author, kind=ExportJob.RECIPES, fingerprint=""
+        )
+        self.assertEqual(claim_jobs(1), [job.pk])
+        return job
+
+    def test_touched_job_is_not_reclaimed(self):
+        job = self.claim()
+        stale = timezone.now() - timedelta(
+            seconds=settings.EXPORT_JOB_TIMEOUT + 1
+        )
+        ExportJob.objects.filter(pk=job.pk).update(
+            started=stale, heartbeat=stale
+        )
+        touch_jobs([job.pk])
+        self.assertEqual(claim_jobs(1), [])
+        ExportJob.objects.filter(pk=job.pk).update(heartbeat=stale)
+        self.assertEqual(claim_jobs(1), [job.pk])
+
+    @override_settings(MEDIA_ROOT=MEDIA_ROOT)
+    def test_reclaimed_job_result_is_dropped(self):
+        job = self.claim()
+
+        def reclaim_and_render(user, file):
+            # Пока строится файл, задание забирает другой воркер.
+            ExportJob.objects.filter(pk=job.pk).update(
+                started=timezone.now()
+            )
+            render_recipes(user, file)
+
+        with mock.patch.dict(
+            "api.exports.EXPORTS",
+            {ExportJob.RECIPES: ("jsonl", recipes_state, reclaim_and_render)},
+        ):
+            self.assertEqual(run_job(job.pk), RECLAIMED)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.RUNNING)
+        self.assertEqual(job.file.name, "")
+        self.assertEqual(run_job(job.pk), ExportJob.DONE)
+
+    def test_fingerprint_covers_related_objects(self):
+        fingerprint = data_fingerprint(ExportJob.RECIPES, self.author)
+        self.ingredient.name = "Буряк"
+        self.ingredient.save()
+        changed = data_fingerprint(ExportJob.RECIPES, self.author)
+        self.assertNotEqual(changed, fingerprint)
+        self.author.first_name = "Автор"
+        self.author.save()
+        self.assertNotEqual(
+            data_fingerprint(ExportJob.RECIPES, self.author), changed
+        )
+
+
+class CacheBucketBackendTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.backend = CacheBucketBackend()
+
+    def consume(self, now, cost=1):
+        return self.backend.consume("anon:1", cost, 2, 1.0, now)
+
+    def test_limit_and_refill(self):
+        self.assertEqual(self.consume(100), (True, 0))
+        self.assertEqual(self.consume(100), (True, 0))
+        self.assertEqual(self.consume(100), (False, 1.0))
+        self.assertEqual(self.consume(100.5), (False, 0.5))
+        self.assertEqual(self.consume(101), (True, 0))
+
+    def test_idle_time_does_not_exceed_capacity(self):
+        self.consume(100)
+        self.assertEqual(self.consume(1000, cost=2), (True, 0))
+        self.assertFalse(self.consume(1000)[0])
+
+
+@override_settings(THROTTLE_BACKEND="api.throttling.CacheBucketBackend")
+class AnonThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def get(self, forwarded_for):
+        return self.client.get(
+            "/api/tags/", HTTP_X_FORWARDED_FOR=forwarded_for
+        )
+
+    def test_client_address_comes_from_nearest_proxy(self):
+        with mock.patch.dict(
+            api_settings.DEFAULT_THROTTLE_RATES, {"anon": "1/min"}
+        ), mock.patch("api.throttling._backend", None):
+            self.assertEqual(self.get("10.0.0.1").status_code, 200)
+            self.assertEqual(self.get("1.2.3.4, 10.0.0.1").status_code, 429)
+            self.assertEqual(self.get("10.0.0.2").status_code, 200)
+
+
+@override_settings(
+    MIDDLEWARE=["api.edge.EdgeCacheMiddleware", *settings.MIDDLEWARE],
+    EDGE_PURGE_BACKEND="api.edge.LocalPurgeBackend",
+)
+class EdgeCacheTest(TestCase):
+    """Локальный кэш анонимных ответов и его сброс по журналу."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username="author", email="author@example.com", password="pass"
+        )
+        cls.other = User.objects.create_user(
+            username="other", email="other@example.com", password="pass"
+        )
+        cls.tag = Tag.objects.create(
+            name="Обед", color="#FF0000", slug="lunch"
+        )
+        cls.recipe = create_recipe(cls.author, "Борщ")
+        cls.other_recipe = create_recipe(cls.other, "Щи")
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch("api.edge._backend", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.last_event = ChangeEvent.objects.order_by("id").last().id
+
+    def consume(self):
+        """Обрабатывает новые события, как consumeevents."""
+        events = list(ChangeEvent.objects.filter(id__gt=self.last_event))
+        dispatch(events)
+        self.last_event = events[-1].id
+
+    def cache_status(self, url, **headers):
+        return self.client.get(url, **headers).get("X-Cache-Status")
+
+    def assertCacheStatus(self, statuses):
+        for url, status in statuses.items():
+            self.assertEqual(self.cache_status(url), status, url)
+
+    def recipe_url(self, recipe):
+        return f"/api/recipes/{recipe.pk}/"
+
+    def test_second_anonymous_get_is_hit(self):
+        url = self.recipe_url(self.recipe)
+        first = self.client.get(url)
+        self.assertEqual(first["X-Cache-Status"], "MISS")
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second["X-Cache-Status"], "HIT")
+        self.assertEqual(second.content, first.content)
+
+    def warm(self):
+        urls = {
+            "recipe": self.recipe_url(self.recipe),
+            "other_recipe": self.recipe_url(self.other_recipe),
+            "tags": "/api/tags/",
+            "ingredients": "/api/ingredients/",
+        }
+        for url in urls.values():
+            self.client.get(url)
+        return urls
+
+    def test_recipe_change_purges_its_keys(self):
+        urls = self.warm()
+        self.recipe.name = "Борщ зеленый"
+        self.recipe.save()
+        self.consume()
+        self.assertCacheStatus(
+            {
+                urls["recipe"]: "MISS",
+                urls["other_recipe"]: "HIT",
+                urls["tags"]: "HIT",
+                urls["ingredients"]: "HIT",
+            }
+        )
+
+    def test_tag_change_purges_tagged_responses(self):
+        urls = self.warm()
+        self.tag.name = "Ужин"
+        self.tag.save()
+        self.consume()
+        self.assertCacheStatus(
+            {
+                urls["tags"]: "MISS",
+                urls["recipe"]: "MISS",
+                urls["ingredients"]: "HIT",
+            }
+        )
+
+    def test_user_change_purges_author_keys(self):
+        urls = self.warm()
+        self.author.first_name = "Автор"
+        self.author.save()
+        self.consume()
+        self.assertCacheStatus(
+            {
+                urls["recipe"]: "MISS",
+                urls["other_recipe"]: "HIT",
+                urls["tags"]: "HIT",
+            }
+        )
+
+    def test_authenticated_requests_bypass_cache(self):
+        url = self.recipe_url(self.recipe)
+        auth = {
+            "HTTP_AUTHORIZATION": "Token "
+            + Token.objects.create(user=self.other).key
+        }
+        self.assertIsNone(self.cache_status(url, **auth))
+        self.assertEqual(self.cache_status(url), "MISS")
+        self.assertIsNone(self.cache_status(url, **auth))
+        self.assertIn(
+            "private", self.client.get(url, **auth)["Cache-Control"]
+        )
+
+
+class PantryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username="author", email="author@example.com", password="pass"
+        )
+        beet, cabbage, potato = (
+            Ingredient.objects.create(name=name, measurement_unit="г")
+            for name in ("Свекла", "Капуста", "Картофель")
+        )
+        cls.pantry = f"{beet.pk},{cabbage.pk}"
+        recipes = {
+            "Борщ": (beet, cabbage, potato),
+            "Щи": (cabbage,),
+            "Драники": (potato,),
+        }
+        for name, ingredients in recipes.items():
+            recipe = create_recipe(author, name)
+            for ingredient in ingredients:
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=100
+                )
+
+    def test_orders_by_missing_ingredients(self):
+        response = self.client.get(
+            "/api/recipes/pantry/", {"ingredients": self.pantry}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [
+                (recipe["name"], recipe["missing_ingredients"])
+                for recipe in response.data["results"]
+            ],
+            [("Щи", 0), ("Борщ", 1)],
+        )
+
+    def test_takes_two_arguments(self):
+        with self.assertRaises(TypeError):
+            MissingIngredientsCount("ingredient_ids")
+
+
+class IngredientIdsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username="author", email="author@example.com", password="pass"
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit="г")
+            for name in ("Свекла", "Капуста", "Картофель")
+        ]
+        cls.recipes = [create_recipe(author, name) for name in ("Борщ", "Щи")]
+        for recipe in cls.recipes:
+            for ingredient in cls.ingredients:
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=100
+                )
+
+    def ingredient_ids(self):
+        return list(
+            Recipe.objects.order_by("pk").values_list(
+                "ingredient_ids", flat=True
+            )
+        )
+
+    def test_delete_syncs_recipes_once_on_commit(self):
+        kept = self.ingredients[0]
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                RecipeIngredient.objects.exclude(ingredient=kept).delete()
+                # До коммита массивы не трогаются.
+                self.assertEqual(
+                    [len(ids) for ids in self.ingredient_ids()], [3, 3]
+                )
+        updates = [
+            query
+            for query in queries
+            if query["sql"].startswith('UPDATE "recipes_recipe"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.ingredient_ids(), [[kept.pk], [kept.pk]])
@@ -0,0 +1,143 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+DURATIONS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """'300/min' -> (300 жетонов, 5 жетонов в секунду)."""
+    count, period = rate.split("/")
+    count = int(count)
+    return count, count / DURATIONS[period[0]]
+
+
+class LocalBucketBackend:
+    """Корзины жетонов в памяти процесса."""
+
+    max_entries = 10000
+
+    def __init__(self):
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def consume(self, key, cost, capacity, refill_rate, now):
+        with self.lock:
+            tokens, updated = self.buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self.buckets[key] = (tokens, now)
+            if len(self.buckets) > self.max_entries:
+                self.buckets.popitem(last=False)
+        return allowed, 0 if allowed else (cost - tokens) / refill_rate
+
+
+class CacheBucketBackend:
+    """Корзины жетонов в общем кэше Django, общие для всех воркеров.
+
+    Корзина хранится как момент ее создания и счетчик потраченных
+    жетонов: к моменту now заработано capacity + (now - start) *
+    refill_rate. Счетчик меняется только атомарными incr/decr, поэтому
+    одновременные запросы одного клиента не пропустят больше лимита.
+    Нужен кэш с атомарным incr: Redis, Memcached, LocMemCache.
+    """
+
+    timeout = 86400
+
+    def consume(self, key, cost, capacity, refill_rate, now):
+        start_key = f"throttle:{key}"
+        cache.add(start_key, now, self.timeout)
+        start = cache.get(start_key, now)
+        # Счетчик привязан к start: если момент создания вытеснен из
+        # кэша, корзина начинается заново, а не со старым долгом.
+        used_key = f"{start_key}:{start}"
+        cache.add(used_key, 0, self.timeout)
+        try:
+            used = cache.incr(used_key, cost)
+        except ValueError:
+            # Счетчик вытеснен между add и incr.
+            return True, 0
+        earned = capacity + (now - start) * refill_rate
+        idle = math.floor(earned - capacity) - (used - cost)
+        if idle > 0:
+            # Жетоны сверх capacity за время простоя не копятся. При
+            # одновременном сбросе списывается лишнее, но не меньше.
+            used = cache.incr(used_key, idle)
+        if used > earned:
+            cache.decr(used_key, cost)
+            return False, (used - earned) / refill_rate
+        return True, 0
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.THROTTLE_BACKEND)()
+    return _backend
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Ограничение частоты запросов с учетом их стоимости.
+
+    Каждый клиент (пользователь или IP) получает корзину жетонов для
+    своей области: throttle_scope вьюсета либо user/anon. Обычный запрос
+    стоит один жетон, тяжелые действия - throttle_costs вьюсета, а
+    большие страницы - по жетону за каждые PAGE_SIZE записей.
+    """
+
+    timer = time.time
+
+    def __init__(self):
+        self._wait = None
+
+    def get_scope(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        if scope:
+            return scope
+        return "user" if request.user.is_authenticated else "anon"
+
+    def get_cost(self, request, view):
+        cost = getattr(view, "throttle_costs", {}).get(
+            getattr(view, "action", None), 1
+        )
+        limit = request.query_params.get("limit")
+        if request.method == "GET" and limit and limit.isdigit():
+            page_size = min(int(limit), settings.MAX_PAGE_SIZE)
+            cost += max(0, math.ceil(page_size / api_settings.PAGE_SIZE) - 1)
+        return cost
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+        capacity, refill_rate = parse_rate(rate)
+        ident = (
+            request.user.pk
+            if request.user.is_authenticated
+            else self.get_ident(request)
+        )
+        allowed, self._wait = get_backend().consume(
+            f"{scope}:{ident}",
+            min(self.get_cost(request, view), capacity),
+            capacity,
+            refill_rate,
+            self.timer(),
+        )
+        return allowed
+
+    def wait(self):
+        return self._wait
@@ -2,8 +2,9 @@ from rest_framework.routers import DefaultRouter
 
 from django.urls import include, path
 
-from api.views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
-                       TagViewSet,)
+from api.views import (ChangeListView, CustomUserViewSet, ExportJobViewSet,
+                       IngredientViewSet, MealPlanViewSet, RecipeViewSet,
+                       SyncView, TagViewSet,)
 
 app_name = "api"
 
@@ -12,9 +13,13 @@ router.register(r"recipes", RecipeViewSet, basename="recipes")
 router.register(r"tags", TagViewSet, basename="tags")
 router.register(r"users", CustomUserViewSet, basename="users")
 router.register(r"ingredients", IngredientViewSet, basename="ingredients")
+router.register(r"meal-plan", MealPlanViewSet, basename="meal-plan")
+router.register(r"exports", ExportJobViewSet, basename="exports")
 
 
 urlpatterns = [
+    path("changes/", ChangeListView.as_view(), name="changes"),
+    path("sync/", SyncView.as_view(), name="sync"),
     path("", include(router.urls)),
     path("", include("djoser.urls")),
     path("auth/", include("djoser.urls.authtoken")),
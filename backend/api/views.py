@@ -1,27 +1,59 @@
+from datetime import date, timedelta
+
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from rest_framework import exceptions, status, viewsets
+from rest_framework import exceptions, generics, mixins, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from django.db.models import Exists, OuterRef
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BigIntegerField, F, Q, Value
+from django.http import FileResponse, HttpResponse
 
+from api.edge import SurrogateKeyMixin, recipe_surrogate_keys
+from api.exports import enqueue_export
+from api.fieldsets import FieldsetMixin
 from api.filters import IngredientFilter, RecipeFilter
-from api.pagination import CustomPagination
+from api.idempotency import idempotent
+from api.pagination import (ChangesPagination, CustomPagination,
+                            FeedPagination, TrendingPagination,)
 from api.permissions import IsAuthorOrReadOnly
-from api.serializers import (CustomUserSerializer, IngredientSerializer,
+from api.serializers import (ChangeEventSerializer, CustomUserSerializer,
+                             ExportJobSerializer, IngredientSerializer,
+                             MealPlanSerializer, PantryRecipeSerializer,
                              RecipeReadSerializer, RecipeShortSerializer,
-                             RecipeWriteSerializer, SubscribeSerializer,
-                             TagSerializer,)
-from api.services import get_shopping_list
-from recipes.models import Favorited, Ingredient, Recipe, ShoppingCart, Tag
+                             RecipeWriteSerializer, ShoppingCartSerializer,
+                             ShoppingCartUpdateSerializer, SubscribeSerializer,
+                             SyncRecipeSerializer, TagSerializer,
+                             ingredients_prefetch, recipe_cards,
+                             refresh_recipe_cards,)
+from api.services import (MissingIngredientsCount, add_subscription,
+                          add_to_list, bulk_create_recipes, get_feed_head,
+                          get_meal_plan_list, get_shopping_list,
+                          overlay_user_state, remove_from_list,
+                          remove_subscription, replace_meal_plan,
+                          shared_payload_key,)
+from api.sync import get_changes, get_sync_token
+from recipes.events import settled_events
+from recipes.models import (ExportJob, Favorited, Ingredient, MealPlan, Recipe,
+                            ShoppingCart, Tag,)
 from users.models import Subscribe, User
 
 
-class CustomUserViewSet(UserViewSet):
+def parse_id(value):
+    """id объекта из адреса; нечисловой id означает 404."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise exceptions.NotFound
+
+
+class CustomUserViewSet(SurrogateKeyMixin, FieldsetMixin, UserViewSet):
     """Вьюсет для пользователей"""
 
     queryset = User.objects.all()
@@ -29,16 +61,39 @@ class CustomUserViewSet(UserViewSet):
     serializer_class = CustomUserSerializer
     permission_classes = (IsAuthenticated,)
 
-    def get_user(self, id):
-        return get_object_or_404(User, id=id)
+    def get_surrogate_keys(self, data):
+        if self.action == "retrieve":
+            return {f"author:{data['id']}"}
+        if self.action == "list":
+            return {"users"} | {
+                f"author:{user['id']}" for user in data["results"]
+            }
+        return ()
+
+    def get_queryset(self):
+        fieldset = self.get_fieldset()
+        return (
+            super()
+            .get_queryset()
+            .prefetch_related(
+                *(
+                    name
+                    for name in ("groups", "user_permissions")
+                    if fieldset is None or fieldset.includes(name)
+                )
+            )
+        )
 
     @action(detail=False,
             methods=["get"],)
     def subscriptions(self, request):
+        fieldset = self.get_fieldset()
         queryset = User.objects.filter(following__user=request.user)
+        if fieldset is None or fieldset.includes("recipes"):
+            queryset = queryset.prefetch_related("recipes")
         pages = self.paginate_queryset(queryset)
         serializer = SubscribeSerializer(
-            pages, many=True, context={"request": request}
+            pages, many=True, context=self.get_serializer_context()
         )
         return self.get_paginated_response(serializer.data)
 
@@ -47,16 +102,17 @@ class CustomUserViewSet(UserViewSet):
         methods=["post"],
         serializer_class=SubscribeSerializer,
     )
+    @idempotent
     def subscribe(self, request, **kwargs):
-        author = self.get_user(kwargs["id"])
-        if request.user == author:
+        author_id = parse_id(kwargs["id"])
+        if request.user.id == author_id:
             raise exceptions.ValidationError(
                 "Подписываться на себя запрещено."
             )
-        _, created = Subscribe.objects.get_or_create(
-            user=request.user, author=author
-        )
-        if not created:
+        author = add_subscription(request.user, author_id)
+        if author is None:
+            raise exceptions.NotFound
+        if not author.created:
             raise exceptions.ValidationError(
                 "Вы уже подписаны на этого пользователя."
             )
@@ -64,20 +120,214 @@ class CustomUserViewSet(UserViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
+    @idempotent
     def unsubscribe(self, request, **kwargs):
-        author = self.get_user(kwargs["id"])
-        get_object_or_404(
-            Subscribe,
-            user=request.user,
-            author=author
-        ).delete()
+        if not remove_subscription(request.user, parse_id(kwargs["id"])):
+            raise exceptions.NotFound
         return Response(
             {"detail": "Успешная отписка"},
             status=status.HTTP_204_NO_CONTENT
         )
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class ChangeListView(generics.ListAPIView):
+    """Журнал изменений для инкрементальной синхронизации клиентов.
+
+    Публичные события видны всем, события избранного, списка покупок
+    и подписок - только их владельцу.
+    """
+
+    serializer_class = ChangeEventSerializer
+    pagination_class = ChangesPagination
+    permission_classes = (AllowAny,)
+
+    def get_queryset(self):
+        visible = Q(user_id__isnull=True)
+        if self.request.user.is_authenticated:
+            visible |= Q(user_id=self.request.user.pk)
+        return settled_events().filter(visible)
+
+
+class MealPlanViewSet(
+    mixins.ListModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet
+):
+    """План питания пользователя по неделям.
+
+    Неделя задается параметром start (YYYY-MM-DD) - первым из семи
+    дней, по умолчанию текущая неделя с понедельника.
+    """
+
+    serializer_class = MealPlanSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = None
+
+    def get_queryset(self):
+        return MealPlan.objects.filter(user=self.request.user).select_related(
+            "recipe"
+        )
+
+    def get_week(self):
+        start = self.request.query_params.get("start")
+        if start is None:
+            today = date.today()
+            start = today - timedelta(days=today.weekday())
+        else:
+            try:
+                start = date.fromisoformat(start)
+            except ValueError:
+                raise exceptions.ValidationError(
+                    {"start": "Ожидается дата в формате YYYY-MM-DD."}
+                )
+        return start, start + timedelta(days=6)
+
+    def filter_queryset(self, queryset):
+        if self.action == "list":
+            queryset = queryset.filter(date__range=self.get_week())
+        return queryset
+
+    @action(detail=False, methods=["put"])
+    def week(self, request):
+        """Заполняет неделю целиком, заменяя прежние записи."""
+        start, end = self.get_week()
+        items = request.data if isinstance(request.data, list) else []
+        context = self.get_serializer_context()
+        context["preloaded"] = {
+            Recipe: Recipe.objects.in_bulk(
+                {
+                    int(item["recipe"])
+                    for item in items
+                    if isinstance(item, dict)
+                    and str(item.get("recipe")).isdigit()
+                }
+            )
+        }
+        serializer = self.get_serializer(
+            data=request.data, many=True, context=context
+        )
+        serializer.is_valid(raise_exception=True)
+        entries = serializer.validated_data
+        if any(not start <= entry["date"] <= end for entry in entries):
+            raise exceptions.ValidationError(
+                f"Даты должны быть в пределах {start} - {end}."
+            )
+        keys = [
+            (entry["date"], entry["slot"], entry["recipe"].pk)
+            for entry in entries
+        ]
+        if len(set(keys)) != len(keys):
+            raise exceptions.ValidationError(
+                "Рецепт повторяется в одном приеме пищи."
+            )
+        entries = replace_meal_plan(request.user, start, end, entries)
+        return Response(
+            self.get_serializer(entries, many=True, context=context).data
+        )
+
+    @action(detail=False, methods=["get"])
+    def download(self, request):
+        start, end = self.get_week()
+        shopping_list = get_meal_plan_list(request.user, start, end)
+        filename = f"{request.user.username}_meal_plan_{start}.txt"
+        response = HttpResponse(content_type="text/plain")
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        response.write(shopping_list.getvalue())
+        return response
+
+
+class ExportJobViewSet(
+    mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+):
+    """Фоновые выгрузки пользователя.
+
+    POST ставит выгрузку в очередь команды runjobs, статус опрашивается
+    по id, готовый файл отдает download. Если данные не менялись,
+    возвращается уже готовая выгрузка.
+    """
+
+    serializer_class = ExportJobSerializer
+    permission_classes = (IsAuthenticated,)
+    throttle_costs = {"create": 10}
+
+    def get_queryset(self):
+        return ExportJob.objects.filter(user=self.request.user)
+
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job, created = enqueue_export(
+            request.user, serializer.validated_data["kind"]
+        )
+        return Response(
+            self.get_serializer(job).data,
+            status=(
+                status.HTTP_202_ACCEPTED
+                if created and job.status != ExportJob.DONE
+                else status.HTTP_200_OK
+            ),
+        )
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk):
+        job = self.get_object()
+        if job.status != ExportJob.DONE:
+            return Response(
+                {"errors": "Выгрузка еще не готова.", "status": job.status},
+                status=status.HTTP_409_CONFLICT,
+            )
+        extension = job.file.name.rsplit(".", 1)[-1]
+        return FileResponse(
+            job.file.open("rb"),
+            as_attachment=True,
+            filename=f"{request.user.username}_{job.kind}.{extension}",
+        )
+
+
+class SyncView(APIView):
+    """Дельта-синхронизация справочников и личных списков.
+
+    Без token возвращает текущий token: клиент загружает списки
+    обычными запросами и дальше получает только изменения. Изменения,
+    попавшие между получением token и загрузкой, придут повторно,
+    применять их можно идемпотентно.
+    """
+
+    permission_classes = (AllowAny,)
+
+    def get(self, request):
+        token = request.query_params.get("token")
+        if not token:
+            return Response(
+                {
+                    "token": get_sync_token(request.user),
+                    "reset": True,
+                    "has_more": False,
+                }
+            )
+        try:
+            token = int(token)
+        except ValueError:
+            raise exceptions.ValidationError({"token": "Неверный token."})
+        changes, token, has_more = get_changes(
+            request.user, token, settings.SYNC_BATCH_SIZE
+        )
+        context = self.get_serializer_context()
+        for name, serializer_class in (
+            ("recipes", SyncRecipeSerializer),
+            ("tags", TagSerializer),
+            ("ingredients", IngredientSerializer),
+        ):
+            changes[name]["updated"] = serializer_class(
+                changes[name]["updated"], many=True, context=context
+            ).data
+        return Response(
+            {"token": token, "reset": False, "has_more": has_more, **changes}
+        )
+
+    def get_serializer_context(self):
+        return {"request": self.request, "view": self}
+
+
+class IngredientViewSet(SurrogateKeyMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для ингредиентов"""
 
     queryset = Ingredient.objects.all()
@@ -87,16 +337,27 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
     search_fields = ("name",)
 
+    def get_surrogate_keys(self, data):
+        return {"ingredients"}
+
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(SurrogateKeyMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для тегов"""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
+    def get_surrogate_keys(self, data):
+        return {"tag:all"}
+
+
+SHARED_ACTIONS = ("list", "retrieve", "trending", "feed", "pantry")
+PUBLIC_ACTIONS = ("list", "retrieve", "trending", "pantry", "similar")
+PERSONAL_FILTERS = {"is_favorited", "is_in_shopping_cart"}
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(SurrogateKeyMixin, FieldsetMixin, viewsets.ModelViewSet):
     """Вьюсет для рецептов"""
 
     pagination_class = CustomPagination
@@ -104,39 +365,258 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filterset_class = RecipeFilter
     http_method_names = ["get", "post", "patch", "create", "delete"]
     permission_classes = (IsAuthorOrReadOnly,)
+    throttle_costs = {
+        "create": 10,
+        "partial_update": 10,
+        "download_shopping_cart": 20,
+        "bulk": 50,
+    }
+    collapsed_fields = {
+        "author": "id",
+        "tags": "id",
+        "ingredients": "ingredient",
+    }
 
     def get_queryset(self):
+        """Связи, не нужные по fields и expand, не загружаются."""
+        if self.action in ("list", "retrieve"):
+            return Recipe.objects.only("pk", "card_json")
+        fieldset = self.get_fieldset()
         queryset = Recipe.objects.all()
-        if self.request.user.is_authenticated:
-            queryset = queryset.annotate(
-                is_favorited=Exists(
-                    Favorited.objects.filter(
-                        user=self.request.user, recipe=OuterRef("pk")
-                    )
-                ),
-                is_in_shopping_cart=Exists(
-                    ShoppingCart.objects.filter(
-                        user=self.request.user, recipe=OuterRef("pk")
-                    )
-                ),
-            )
-        Recipe.objects.select_related("author").prefetch_related(
-            "tags", "ingredient"
-        )
+        if fieldset is None or fieldset.expands("author"):
+            author = fieldset and fieldset.nested("author")
+            queryset = queryset.select_related("author").prefetch_related(
+                *(
+                    f"author__{name}"
+                    for name in ("groups", "user_permissions")
+                    if author is None or author.includes(name)
+                )
+            )
+        if fieldset is None or fieldset.includes("tags"):
+            queryset = queryset.prefetch_related("tags")
+        if fieldset is None or (
+            fieldset.includes("ingredients")
+            and fieldset.expands("ingredients")
+        ):
+            queryset = queryset.prefetch_related(ingredients_prefetch())
         return queryset
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["shared"] = self.action in SHARED_ACTIONS
+        return context
+
+    def get_surrogate_keys(self, data):
+        """Ключи рецептов, их авторов и справочников в ответе.
+
+        Списки помечаются еще и ключом recipes: новый или удаленный
+        рецепт меняет любую страницу.
+        """
+        if self.action not in PUBLIC_ACTIONS:
+            return ()
+        if isinstance(data, dict) and "results" in data:
+            recipes = data["results"]
+        elif isinstance(data, dict):
+            recipes = [data]
+        else:
+            recipes = data
+        keys = recipe_surrogate_keys(recipes)
+        if self.action != "retrieve":
+            keys.add("recipes")
+        if self.action == "similar":
+            keys.add(f"recipe:{parse_id(self.kwargs['pk'])}")
+        return keys
+
+    def list(self, request, *args, **kwargs):
+        return self.shared_response(self.list_cards, request)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.shared_response(self.retrieve_card, request)
+
+    def list_cards(self, request):
+        """Страница сохраненных карточек без сериализации рецептов."""
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        return self.get_paginated_response(recipe_cards(page, request))
+
+    def retrieve_card(self, request):
+        return Response(recipe_cards([self.get_object()], request)[0])
+
+    def shared_response(self, view, request, *args, **kwargs):
+        """Общий для всех пользователей ответ с наложенными флагами.
+
+        Страница рецептов кэшируется без учета пользователя, а его
+        избранное, список покупок и подписки проставляются поверх.
+        Фильтры по избранному и списку покупок зависят от пользователя,
+        такие ответы не кэшируются.
+        """
+        cacheable = settings.RECIPES_CACHE_TIMEOUT and not (
+            PERSONAL_FILTERS & request.query_params.keys()
+        )
+        data = None
+        if cacheable:
+            key = shared_payload_key(request)
+            data = cache.get(key)
+        if data is None:
+            data = view(request, *args, **kwargs).data
+            if cacheable:
+                cache.set(key, data, settings.RECIPES_CACHE_TIMEOUT)
+        return Response(overlay_user_state(request.user, data))
+
+    def get_paginated_recipes(self, queryset):
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(
+            overlay_user_state(self.request.user, serializer.data)
+        )
+
     def get_serializer_class(self):
-        if self.action == "list" or self.action == "retrieve":
+        if self.action == "pantry":
+            return PantryRecipeSerializer
+        if self.action in ("list", "retrieve", "trending", "feed"):
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
+    @action(
+        detail=False,
+        methods=["get"],
+        pagination_class=TrendingPagination,
+    )
+    def trending(self, request):
+        queryset = self.filter_queryset(
+            self.get_queryset()
+            .filter(rank__isnull=False)
+            .annotate(trending_position=F("rank__position"))
+        )
+        return self.get_paginated_recipes(queryset)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=(IsAuthenticated,),
+        pagination_class=FeedPagination,
+    )
+    def feed(self, request):
+        queryset = self.get_queryset().filter(
+            author__in=Subscribe.objects.filter(user=request.user).values(
+                "author"
+            )
+        )
+        if self.paginator.cursor_query_param not in request.query_params:
+            head = get_feed_head(
+                request.user,
+                queryset.order_by(self.paginator.ordering),
+                self.paginator.get_page_size(request),
+            )
+            if head is not None:
+                queryset = self.get_queryset().filter(pk__in=head)
+        return self.get_paginated_recipes(queryset)
+
+    @action(detail=False, methods=["get"])
+    def pantry(self, request):
+        try:
+            ingredient_ids = sorted({
+                int(ingredient_id)
+                for value in request.query_params.getlist("ingredients")
+                for ingredient_id in value.split(",")
+                if ingredient_id
+            })
+        except ValueError:
+            raise exceptions.ValidationError(
+                {"ingredients": "Ожидается список id ингредиентов."}
+            )
+        if not ingredient_ids:
+            raise exceptions.ValidationError(
+                {"ingredients": "Укажите хотя бы один ингредиент."}
+            )
+        pantry = Value(
+            ingredient_ids, output_field=ArrayField(BigIntegerField())
+        )
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .filter(ingredient_ids__overlap=pantry)
+            .annotate(
+                missing_ingredients=MissingIngredientsCount(
+                    "ingredient_ids", pantry
+                )
+            )
+            .order_by("missing_ingredients", "-pub_date")
+        )
+        return self.get_paginated_recipes(queryset)
+
+    @action(
+        detail=False, methods=["post"], permission_classes=(IsAuthenticated,)
+    )
+    def bulk(self, request):
+        """Пакетное создание рецептов с результатом по каждому из них.
+
+        Корректные рецепты создаются, даже если часть пакета с ошибками.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise exceptions.ValidationError("Ожидается непустой список.")
+        if len(items) > settings.RECIPES_BULK_MAX_SIZE:
+            raise exceptions.ValidationError(
+                "Не больше "
+                f"{settings.RECIPES_BULK_MAX_SIZE} рецептов за запрос."
+            )
+        context = self.get_serializer_context()
+        context["preloaded"] = RecipeWriteSerializer.preload(items)
+        results, valid = [], []
+        for index, item in enumerate(items):
+            serializer = RecipeWriteSerializer(data=item, context=context)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results.append({"index": index, "errors": serializer.errors})
+        with transaction.atomic():
+            recipes = bulk_create_recipes(
+                request.user, [data for _, data in valid]
+            )
+            refresh_recipe_cards(recipe.pk for recipe in recipes)
+        results.extend(
+            {"index": index, "id": recipe.pk}
+            for (index, _), recipe in zip(valid, recipes)
+        )
+        results.sort(key=lambda result: result["index"])
+        if not recipes:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif len(recipes) < len(items):
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response(
+            {
+                "created": len(recipes),
+                "failed": len(items) - len(recipes),
+                "results": results,
+            },
+            status=response_status,
+        )
+
+    @action(detail=True, methods=["get"], pagination_class=None)
+    def similar(self, request, pk):
+        pk = parse_id(pk)
+        if not Recipe.objects.filter(pk=pk).exists():
+            raise exceptions.NotFound
+        queryset = Recipe.objects.filter(similar_to__recipe_id=pk).order_by(
+            "-similar_to__score"
+        )
+        serializer = RecipeShortSerializer(
+            queryset, many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
     @action(
         detail=True, methods=["post"], permission_classes=(IsAuthenticated,)
     )
+    @idempotent
     def favorite(self, request, pk):
         return self.add_to(Favorited, request.user, pk)
 
     @favorite.mapping.delete
+    @idempotent
     def unfavorite(self, request, pk):
         return self.delete_from(Favorited, request.user, pk)
 
@@ -146,10 +626,34 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=(IsAuthenticated,),
         pagination_class=None,
     )
+    @idempotent
     def shopping_cart(self, request, pk):
-        return self.add_to(ShoppingCart, request.user, pk)
+        serializer = ShoppingCartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self.add_to(
+            ShoppingCart,
+            request.user,
+            pk,
+            **{
+                field: value
+                for field, value in serializer.validated_data.items()
+                if value is not None
+            },
+        )
+
+    @shopping_cart.mapping.patch
+    @idempotent
+    def update_shopping_cart(self, request, pk):
+        cart = generics.get_object_or_404(
+            ShoppingCart, user=request.user, recipe_id=parse_id(pk)
+        )
+        serializer = ShoppingCartUpdateSerializer(cart, data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
 
     @shopping_cart.mapping.delete
+    @idempotent
     def delete_from_shopping_cart(self, request, pk):
         return self.delete_from(ShoppingCart, request.user, pk)
 
@@ -169,21 +673,20 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return response
 
-    def add_to(self, model, user, pk):
-        if model.objects.filter(user=user, recipe__id=pk).exists():
+    def add_to(self, model, user, pk, **values):
+        recipe = add_to_list(model, user, parse_id(pk), **values)
+        if recipe is None:
+            raise exceptions.NotFound
+        if not recipe.created:
             return Response(
                 {"errors": "Рецепт уже добавлен!"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        recipe = get_object_or_404(Recipe, id=pk)
-        model.objects.create(user=user, recipe=recipe)
         serializer = RecipeShortSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete_from(self, model, user, pk):
-        obj = model.objects.filter(user=user, recipe__id=pk)
-        if obj.exists():
-            obj.delete()
+        if remove_from_list(model, user, parse_id(pk)):
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {"errors": "Рецепт уже удален!"},
@@ -1,5 +1,7 @@
 import os
 
+from corsheaders.defaults import default_headers
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 SECRET_KEY = os.getenv("SECRET_KEY", "default_secret_key")
@@ -33,7 +35,6 @@ INSTALLED_APPS = [
     "rest_framework",
     "rest_framework.authtoken",
     "djoser",
-    "drf_base64",
     "api.apps.ApiConfig",
     "recipes.apps.RecipesConfig",
     "users.apps.UsersConfig",
@@ -42,12 +43,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "api.sqlcapture.SQLCaptureMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
-    "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "api.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -57,7 +59,7 @@ ROOT_URLCONF = "foodgram.urls"
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
-        "DIRS": [],
+        "DIRS": [os.path.join(BASE_DIR, "templates")],
         "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
@@ -91,6 +93,17 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", ""),
         "HOST": os.getenv("DB_HOST", ""),
         "PORT": os.getenv("DB_PORT", 5432),
+        # Тестовая база в UTF-8 независимо от кодировки template1
+        "TEST": {"CHARSET": "UTF8", "TEMPLATE": "template0"},
+    }
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
     }
 }
 
@@ -107,9 +120,29 @@ REST_FRAMEWORK = {
     ],
     "DEFAULT_PAGINATION_CLASS": "api.pagination.CustomPagination",
     "PAGE_SIZE": 6,
+    "DEFAULT_THROTTLE_CLASSES": [
+        "api.throttling.TokenBucketThrottle",
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": os.getenv("THROTTLE_RATE_ANON", "120/min"),
+        "user": os.getenv("THROTTLE_RATE_USER", "300/min"),
+    },
     "SEARCH_PARAM": "name",
+    # Число прокси перед бэкендом (nginx): адрес анонимного клиента
+    # берется из X-Forwarded-For, дописанного ближайшим прокси, а не
+    # из подставленного самим клиентом
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", 1)),
 }
 
+# Максимальный размер страницы, который можно запросить параметром limit
+MAX_PAGE_SIZE = 100
+
+# api.throttling.LocalBucketBackend - лимиты в памяти каждого воркера,
+# api.throttling.CacheBucketBackend - общие лимиты через CACHES
+THROTTLE_BACKEND = os.getenv(
+    "THROTTLE_BACKEND", "api.throttling.LocalBucketBackend"
+)
+
 DJOSER = {
     "LOGIN_FIELD": "email",
     "HIDE_USERS": False,
@@ -178,3 +211,69 @@ EMPTY_VALUE_DISPLAY = "-пусто-"
 CORS_ALLOWED_ORIGINS = ["http://localhost:8000",
                         "http://127.0.0.1:8000",
                         "https://fgram.dynnamn.ru"]
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
+
+# Рейтинг популярности рецептов (команда refreshtrending)
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", 72))
+TRENDING_FAVORITE_WEIGHT = 1.0
+TRENDING_SHOPPING_CART_WEIGHT = 2.0
+
+# Время жизни закэшированной головы ленты подписок, 0 - кэш отключен
+FEED_CACHE_TIMEOUT = int(os.getenv("FEED_CACHE_TIMEOUT", 300))
+
+# Время жизни общего для всех пользователей кэша списка и карточек
+# рецептов, 0 - кэш отключен
+RECIPES_CACHE_TIMEOUT = int(os.getenv("RECIPES_CACHE_TIMEOUT", 60))
+
+# Максимум рецептов в одном запросе /api/recipes/bulk/
+RECIPES_BULK_MAX_SIZE = 100
+
+# Максимум событий журнала в одном ответе /api/sync/
+SYNC_BATCH_SIZE = 500
+
+# Количество похожих рецептов в индексе (команда buildsimilar)
+SIMILAR_RECIPES_COUNT = 10
+
+# Время жизни кэша статистики в админке, в секундах
+DASHBOARD_CACHE_TIMEOUT = 60
+
+# Сколько хранится ответ на запрос с заголовком Idempotency-Key, в секундах
+IDEMPOTENCY_KEY_TIMEOUT = int(os.getenv("IDEMPOTENCY_KEY_TIMEOUT", 600))
+
+# Фоновые выгрузки (команда runjobs): число процессов пула, время,
+# после которого зависшее задание запускается повторно, и время
+# хранения готовых файлов, в секундах
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", 2))
+EXPORT_JOB_TIMEOUT = 600
+EXPORT_ARTIFACT_TTL = int(os.getenv("EXPORT_ARTIFACT_TTL", 86400))
+
+# Кэширующий прокси перед API. Анонимные ответы с Surrogate-Key
+# хранятся в нем EDGE_CACHE_TIMEOUT секунд, 0 - не кэшировать.
+# Сброс по ключам из журнала изменений (consumeevents):
+# api.edge.DummyPurgeBackend - без сброса,
+# api.edge.HttpPurgeBackend - запрос PURGE на EDGE_PURGE_URL,
+# api.edge.LocalPurgeBackend - локальный кэш EdgeCacheMiddleware
+EDGE_CACHE_TIMEOUT = int(os.getenv("EDGE_CACHE_TIMEOUT", 60))
+EDGE_PURGE_BACKEND = os.getenv(
+    "EDGE_PURGE_BACKEND", "api.edge.DummyPurgeBackend"
+)
+EDGE_PURGE_URL = os.getenv("EDGE_PURGE_URL", "")
+EDGE_PURGE_TIMEOUT = 5
+if EDGE_PURGE_BACKEND == "api.edge.LocalPurgeBackend":
+    MIDDLEWARE.insert(0, "api.edge.EdgeCacheMiddleware")
+
+# Запись SQL-запросов каждого HTTP-запроса (api.sqlcapture): запросы
+# дольше SQL_SLOW_QUERY_MS миллисекунд попадают в журнал на
+# SQL_SLOW_LOG_SIZE записей, доля SQL_EXPLAIN_SAMPLE_RATE медленных
+# SELECT получает план EXPLAIN (ANALYZE, BUFFERS)
+SQL_CAPTURE = os.getenv("SQL_CAPTURE", default="False") == "True"
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", 100))
+SQL_EXPLAIN_SAMPLE_RATE = float(os.getenv("SQL_EXPLAIN_SAMPLE_RATE", 0.1))
+SQL_SLOW_LOG_SIZE = 200
+
+# Профилирование запросов сотрудников (заголовок X-Profile: 1 или
+# ?profile=1): не больше PROFILE_MAX_CONCURRENT одновременно на процесс,
+# 0 - выключено; хранятся последние PROFILE_KEEP профилей
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", 1))
+PROFILE_ROOT = os.getenv("PROFILE_ROOT", os.path.join(BASE_DIR, "profiles"))
+PROFILE_KEEP = 50
@@ -1,7 +1,31 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from api.profiling import profile_download_view, profiles_view
+from api.sqlcapture import slow_queries_view
+from recipes.views import dashboard
+
 urlpatterns = [
+    path(
+        "admin/dashboard/",
+        admin.site.admin_view(dashboard),
+        name="admin-dashboard",
+    ),
+    path(
+        "admin/slow-queries/",
+        admin.site.admin_view(slow_queries_view),
+        name="admin-slow-queries",
+    ),
+    path(
+        "admin/profiles/",
+        admin.site.admin_view(profiles_view),
+        name="admin-profiles",
+    ),
+    path(
+        "admin/profiles/<str:name>/",
+        admin.site.admin_view(profile_download_view),
+        name="admin-profile",
+    ),
     path("admin/", admin.site.urls),
     path("api/", include("api.urls")),
 ]
@@ -0,0 +1,18 @@
+from django.db import connections
+from django.urls import get_resolver, reverse
+
+
+def warm_up():
+    """Прогрев процесса до приема запросов.
+
+    Заполняет кэши URL-резолвера и загружает справочник для расчета
+    пищевой ценности. При gunicorn --preload выполняется в мастер-процессе,
+    и воркеры получают готовые данные при fork. Соединения с БД
+    закрываются, чтобы они не достались воркерам.
+    """
+    from api.nutrition import get_catalogue
+
+    get_resolver().url_patterns
+    reverse("api:recipes-list")
+    get_catalogue()
+    connections.close_all()
@@ -0,0 +1,28 @@
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", 3))
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        from foodgram.warmup import warm_up
+
+        warm_up()
+
+
+def post_fork(server, worker):
+    # Соединения, открытые мастером до fork, не должны использоваться
+    # несколькими воркерами одновременно.
+    if server.cfg.preload_app:
+        from django.db import connections
+
+        connections.close_all()
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app:
+        from foodgram.warmup import warm_up
+
+        warm_up()
@@ -1,11 +1,24 @@
 from django.conf import settings
 from django.contrib import admin
+from django.utils import timezone
 
-from recipes.models import (Favorited, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag,)
+from recipes.admin_utils import (CachedCountsMixin, EstimatedCountPaginator,
+                                 input_filter,)
+from recipes.models import (Favorited, Ingredient, MeasurementUnit, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag,)
 from users.models import Subscribe
 
 
+def drop_recipe_cards(recipe_ids):
+    """Сбрасывает карточки рецептов, измененных в админке.
+
+    Дата изменения сдвигается, чтобы устарели и выгрузки с рецептом.
+    """
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        card_json=None, updated_at=timezone.now()
+    )
+
+
 class TagAdmin(admin.ModelAdmin):
     list_display = (
         "id",
@@ -27,45 +40,82 @@ class TagAdmin(admin.ModelAdmin):
     empty_value_display = settings.EMPTY_VALUE_DISPLAY
 
 
-class IngredientAdmin(admin.ModelAdmin):
+class MeasurementUnitAdmin(admin.ModelAdmin):
     list_display = (
         "id",
         "name",
-        "measurement_unit",
+        "canonical",
+        "factor",
     )
-    search_fields = (
+    search_fields = ("name",)
+    list_filter = ("canonical",)
+    empty_value_display = settings.EMPTY_VALUE_DISPLAY
+
+
+class IngredientAdmin(CachedCountsMixin, admin.ModelAdmin):
+    list_display = (
+        "id",
         "name",
         "measurement_unit",
+        "calories",
+        "price",
+        "usage_count",
     )
-    list_filter = ("name",)
+    search_fields = ("^name",)
+    list_filter = ("measurement_unit",)
     ordering = ("id",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = settings.EMPTY_VALUE_DISPLAY
+    counted = {"usage_count": (RecipeIngredient, "ingredient")}
+
+    @admin.display(description="В рецептах", ordering="usage_count")
+    def usage_count(self, obj):
+        return obj.usage_count
 
 
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(CachedCountsMixin, admin.ModelAdmin):
     list_display = (
         "id",
         "name",
         "author",
         "cooking_time",
+        "favorites_count",
         "text",
     )
     search_fields = (
-        "username",
-        "email",
-        "first_name",
-        "last_name",
+        "^name",
+        "=author__email",
+        "=author__username",
     )
     list_filter = (
-        "author",
-        "name",
+        input_filter("author", "автору", "email__istartswith"),
         "tags",
     )
-    ordering = ("name",)
+    list_select_related = ("author",)
+    autocomplete_fields = ("author",)
+    ordering = ("-id",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = settings.EMPTY_VALUE_DISPLAY
 
+    counted = {"favorites_count": (Favorited, "recipe")}
+
     filter_horizontal = ("tags",)
 
+    def get_queryset(self, request):
+        # __str__ рецепта обращается к автору, в том числе в autocomplete.
+        return super().get_queryset(request).select_related("author")
+
+    @admin.display(description="В избранном", ordering="favorites_count")
+    def favorites_count(self, obj):
+        return obj.favorites_count
+
+    def save_related(self, request, form, formsets, change):
+        # Теги сохраняются после рецепта: карточку строит первое чтение.
+        super().save_related(request, form, formsets, change)
+        drop_recipe_cards((form.instance.pk,))
+
 
 class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = (
@@ -75,26 +125,47 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
         "amount",
     )
     search_fields = (
-        "recipe",
-        "ingredient",
+        "^recipe__name",
+        "^ingredient__name",
     )
     list_filter = (
-        "recipe",
-        "ingredient",
+        input_filter("recipe", "рецепту", "name__istartswith"),
+        input_filter("ingredient", "ингредиенту", "name__istartswith"),
     )
+    list_select_related = ("recipe__author", "ingredient")
+    autocomplete_fields = ("recipe", "ingredient")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = settings.EMPTY_VALUE_DISPLAY
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        drop_recipe_cards({obj.recipe_id, form.initial.get("recipe")})
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        drop_recipe_cards((obj.recipe_id,))
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list("recipe_id", flat=True))
+        super().delete_queryset(request, queryset)
+        drop_recipe_cards(recipe_ids)
+
 
 class FavoritedAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "recipe")
     search_fields = (
-        "user",
-        "recipe",
+        "=user__email",
+        "^recipe__name",
     )
     list_filter = (
-        "user",
-        "recipe",
+        input_filter("user", "пользователю", "email__istartswith"),
+        input_filter("recipe", "рецепту", "name__istartswith"),
     )
+    list_select_related = ("user", "recipe__author")
+    autocomplete_fields = ("user", "recipe")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = settings.EMPTY_VALUE_DISPLAY
 
 
@@ -105,13 +176,17 @@ class ShoppingCartAdmin(admin.ModelAdmin):
         "recipe",
     )
     search_fields = (
-        "user",
-        "recipe",
+        "=user__email",
+        "^recipe__name",
     )
     list_filter = (
-        "user",
-        "recipe",
+        input_filter("user", "пользователю", "email__istartswith"),
+        input_filter("recipe", "рецепту", "name__istartswith"),
     )
+    list_select_related = ("user", "recipe__author")
+    autocomplete_fields = ("user", "recipe")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = settings.EMPTY_VALUE_DISPLAY
 
 
@@ -121,15 +196,23 @@ class SubscribeAdmin(admin.ModelAdmin):
         "user",
         "author",
     )
-    search_fields = ("author",)
+    search_fields = (
+        "=user__email",
+        "=author__email",
+    )
     list_filter = (
-        "user",
-        "author",
+        input_filter("user", "подписчику", "email__istartswith"),
+        input_filter("author", "автору", "email__istartswith"),
     )
+    list_select_related = ("user", "author")
+    autocomplete_fields = ("user", "author")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = settings.EMPTY_VALUE_DISPLAY
 
 
 admin.site.register(Tag, TagAdmin)
+admin.site.register(MeasurementUnit, MeasurementUnitAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(RecipeIngredient, RecipeIngredientAdmin)
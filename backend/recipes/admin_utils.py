@@ -0,0 +1,169 @@
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+
+class SubqueryCount(Subquery):
+    """Количество строк подзапроса, считается только для строк страницы."""
+
+    template = "(SELECT count(*) FROM (%(subquery)s) _count)"
+    output_field = IntegerField()
+
+
+class CachedCountsChangeList(ChangeList):
+    """Список, берущий счетчики строк страницы из кэша.
+
+    Счетчики из model_admin.counted хранятся DASHBOARD_CACHE_TIMEOUT
+    секунд, недостающие считаются одним запросом на счетчик. Подзапрос
+    по всем строкам добавляется, только если список сортируют по
+    счетчику.
+    """
+
+    def get_queryset(self, request):
+        ordering = {
+            field.lstrip("-")
+            for field in self.get_ordering(request, self.root_queryset)
+            if isinstance(field, str)
+        }
+        self.root_queryset = self.root_queryset.annotate(
+            **{
+                name: SubqueryCount(
+                    model.objects.filter(**{field: OuterRef("pk")}).values(
+                        "pk"
+                    )
+                )
+                for name, (model, field) in self.model_admin.counted.items()
+                if name in ordering
+            }
+        )
+        return super().get_queryset(request)
+
+    def get_results(self, request):
+        super().get_results(request)
+        annotations = self.root_queryset.query.annotations
+        for name, (model, field) in self.model_admin.counted.items():
+            if name not in annotations:
+                self.fill_counts(name, model, field)
+
+    def fill_counts(self, name, model, field):
+        keys = {
+            obj.pk: f"admin:{self.opts.label_lower}:{name}:{obj.pk}"
+            for obj in self.result_list
+        }
+        counts = cache.get_many(keys.values())
+        missing = [pk for pk, key in keys.items() if key not in counts]
+        if missing:
+            fresh = dict.fromkeys(missing, 0)
+            fresh.update(
+                model.objects.filter(**{f"{field}__in": missing})
+                .values(field)
+                .annotate(count=Count("pk"))
+                .values_list(field, "count")
+            )
+            cache.set_many(
+                {keys[pk]: count for pk, count in fresh.items()},
+                settings.DASHBOARD_CACHE_TIMEOUT,
+            )
+            counts.update((keys[pk], count) for pk, count in fresh.items())
+        for obj in self.result_list:
+            setattr(obj, name, counts[keys[obj.pk]])
+
+
+class CachedCountsMixin:
+    """Счетчики связанных записей в списке админки.
+
+    counted - имя счетчика -> (модель, поле связи с записью списка).
+    """
+
+    counted = {}
+
+    def get_changelist(self, request, **kwargs):
+        return CachedCountsChangeList
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, берущий размер нефильтрованной таблицы из статистики.
+
+    Для больших таблиц COUNT(*) без условий читает всю таблицу, поэтому
+    вместо него используется оценка pg_class.reltuples. Отфильтрованные
+    списки и небольшие таблицы считаются точно.
+    """
+
+    estimate_threshold = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if query is not None and not query.where:
+            estimate = self.estimate(self.object_list)
+            if estimate > self.estimate_threshold:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def estimate(queryset):
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                (queryset.model._meta.db_table,),
+            )
+            row = cursor.fetchone()
+        return row[0] if row else -1
+
+
+class InputFilter(admin.SimpleListFilter):
+    """Фильтр по связанной записи с полем ввода вместо списка значений.
+
+    Принимает id записи или начало строки из search_lookup, поэтому не
+    выгружает в боковую панель все связанные записи.
+    """
+
+    template = "admin/input_filter.html"
+    related_field = None
+    search_lookup = None
+
+    def lookups(self, request, model_admin):
+        return ((None, None),)
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if not value:
+            return queryset
+        value = value.strip()
+        condition = Q(**{f"{self.related_field}__{self.search_lookup}": value})
+        if value.isdigit():
+            condition |= Q(**{f"{self.related_field}_id": value})
+        return queryset.filter(condition)
+
+    def choices(self, changelist):
+        yield {
+            "selected": self.value() is None,
+            "query_string": changelist.get_query_string(
+                remove=[self.parameter_name]
+            ),
+            "query_parts": [
+                (key, value)
+                for key, value in changelist.get_filters_params().items()
+                if key != self.parameter_name
+            ],
+            "display": _("All"),
+        }
+
+
+def input_filter(related_field, title, search_lookup):
+    return type(
+        f"{related_field.title()}InputFilter",
+        (InputFilter,),
+        {
+            "title": title,
+            "parameter_name": related_field,
+            "related_field": related_field,
+            "search_lookup": search_lookup,
+        },
+    )
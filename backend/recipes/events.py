@@ -0,0 +1,101 @@
+from collections import defaultdict
+
+from django.db.models import BigIntegerField, Func
+
+from recipes.models import ChangeEvent
+
+_handlers = defaultdict(list)
+
+
+class CurrentXactId(Func):
+    """Номер текущей транзакции, выдается при первой записи в ней."""
+
+    template = "pg_current_xact_id()::text::bigint"
+    output_field = BigIntegerField()
+
+
+class SnapshotXmin(Func):
+    """Номер самой старой транзакции, еще не завершенной в снимке."""
+
+    template = "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+    output_field = BigIntegerField()
+
+
+def handler(*entities):
+    """Регистрирует обработчик событий указанных сущностей.
+
+    Обработчик получает список событий одной сущности в порядке id
+    и вызывается внутри транзакции, сдвигающей позицию consumeevents.
+    """
+
+    def register(func):
+        for entity in entities:
+            _handlers[entity].append(func)
+        return func
+
+    return register
+
+
+def record_event(entity, entity_id, action, user_id=None, **payload):
+    return ChangeEvent.objects.create(
+        entity=entity,
+        entity_id=entity_id,
+        action=action,
+        user_id=user_id,
+        payload=payload,
+        xact_id=CurrentXactId(),
+    )
+
+
+def record_events(entity, entity_ids, action, user_id=None):
+    """Пишет события для пачки объектов, созданных в обход сигналов."""
+    ChangeEvent.objects.bulk_create(
+        ChangeEvent(
+            entity=entity,
+            entity_id=entity_id,
+            action=action,
+            user_id=user_id,
+            xact_id=CurrentXactId(),
+        )
+        for entity_id in entity_ids
+    )
+
+
+def settled_events():
+    """События завершенных транзакций.
+
+    id выдаются до коммита, поэтому событие с меньшим id может стать
+    видимым позже. Транзакции старше xmin снимка уже завершены, и их
+    события больше не появятся.
+    """
+    return ChangeEvent.objects.filter(xact_id__lt=SnapshotXmin())
+
+
+def events_after(queryset, position, batch_size):
+    """Пачка событий транзакций с номером больше position.
+
+    Позиция - номер транзакции, и сдвигается она только целыми
+    транзакциями: иначе события недочитанной транзакции пропали бы.
+    Транзакция больше batch_size читается целиком.
+    Возвращает (события, новая позиция, есть ли еще события).
+    """
+    events = list(
+        queryset.filter(xact_id__gt=position)
+        .order_by("xact_id", "id")[:batch_size + 1]
+    )
+    has_more = len(events) > batch_size
+    if has_more:
+        last = events[batch_size].xact_id
+        events = [
+            event for event in events[:batch_size] if event.xact_id != last
+        ] or list(queryset.filter(xact_id=last).order_by("id"))
+    return events, events[-1].xact_id if events else position, has_more
+
+
+def dispatch(events):
+    grouped = defaultdict(list)
+    for event in events:
+        grouped[event.entity].append(event)
+    for entity, batch in grouped.items():
+        for func in _handlers[entity]:
+            func(batch)
@@ -0,0 +1,47 @@
+from django.db.models import Prefetch
+
+from recipes.models import Recipe, RecipeIngredient
+
+
+def export_recipes():
+    """Рецепты со всеми связями для выгрузки, в порядке id."""
+    return (
+        Recipe.objects.select_related("author")
+        .prefetch_related(
+            "tags",
+            Prefetch(
+                "recipes",
+                queryset=RecipeIngredient.objects.select_related("ingredient"),
+            ),
+        )
+        .order_by("pk")
+    )
+
+
+def recipe_to_dict(recipe):
+    return {
+        "author": {
+            "email": recipe.author.email,
+            "username": recipe.author.username,
+            "first_name": recipe.author.first_name,
+            "last_name": recipe.author.last_name,
+        },
+        "name": recipe.name,
+        "text": recipe.text,
+        "cooking_time": recipe.cooking_time,
+        "servings": recipe.servings,
+        "image": recipe.image.name,
+        "pub_date": recipe.pub_date.isoformat(),
+        "tags": [
+            {"name": tag.name, "color": tag.color, "slug": tag.slug}
+            for tag in recipe.tags.all()
+        ],
+        "ingredients": [
+            {
+                "name": item.ingredient.name,
+                "measurement_unit": item.ingredient.measurement_unit,
+                "amount": item.amount,
+            }
+            for item in recipe.recipes.all()
+        ],
+    }
@@ -0,0 +1,156 @@
+import hashlib
+
+import numpy as np
+from scipy import sparse
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import (Recipe, RecipeFingerprint, RecipeIngredient,
+                            RecipeSimilarity,)
+
+
+def build_matrix(recipe_ids):
+    """Строит разреженную матрицу рецепт x ингредиент.
+
+    Веса ингредиентов - IDF, строки нормированы, поэтому произведение
+    строк дает косинусную близость рецептов.
+    """
+    rows = np.array(
+        list(
+            RecipeIngredient.objects.order_by().values_list(
+                "recipe_id", "ingredient_id"
+            )
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    positions = np.searchsorted(recipe_ids, rows[:, 0])
+    binary = sparse.csr_matrix(
+        (np.ones(len(rows)), (positions, rows[:, 1])),
+        shape=(len(recipe_ids), rows[:, 1].max() + 1 if len(rows) else 0),
+    )
+    binary.sum_duplicates()
+    binary.sort_indices()
+    document_frequency = np.bincount(binary.indices, minlength=binary.shape[1])
+    idf = np.log((1 + len(recipe_ids)) / (1 + document_frequency)) + 1
+    weighted = binary.multiply(idf).tocsr()
+    norms = np.sqrt(weighted.multiply(weighted).sum(axis=1)).A1
+    norms[norms == 0] = 1
+    return binary, sparse.diags(1 / norms) @ weighted
+
+
+def fingerprints(recipe_ids, binary):
+    return {
+        int(recipe_id): hashlib.sha1(
+            binary.indices[
+                binary.indptr[position]:binary.indptr[position + 1]
+            ].tobytes()
+        ).hexdigest()
+        for position, recipe_id in enumerate(recipe_ids)
+    }
+
+
+class Command(BaseCommand):
+    help = "Построение индекса похожих рецептов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=settings.SIMILAR_RECIPES_COUNT,
+            help="Количество похожих рецептов для каждого рецепта",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Перестроить индекс для всех рецептов",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        recipe_ids = np.array(
+            sorted(Recipe.objects.values_list("pk", flat=True)),
+            dtype=np.int64,
+        )
+        binary, matrix = build_matrix(recipe_ids)
+        digests = fingerprints(recipe_ids, binary)
+        if options["full"]:
+            changed = set(digests)
+        else:
+            stored = dict(
+                RecipeFingerprint.objects.values_list("recipe_id", "digest")
+            )
+            changed = {
+                recipe_id
+                for recipe_id, digest in digests.items()
+                if stored.get(recipe_id) != digest
+            }
+        affected = self.affected_positions(recipe_ids, matrix, changed)
+        for start in range(0, len(affected), options["batch_size"]):
+            self.rebuild(
+                recipe_ids,
+                matrix,
+                affected[start:start + options["batch_size"]],
+                options["top"],
+                digests,
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Индекс похожих рецептов обновлен: {len(affected)} рецептов"
+            )
+        )
+
+    def affected_positions(self, recipe_ids, matrix, changed):
+        """Рецепты, чей список похожих мог измениться."""
+        if not changed:
+            return np.array([], dtype=np.int64)
+        changed_positions = np.searchsorted(recipe_ids, sorted(changed))
+        overlap = matrix @ matrix[changed_positions].T
+        affected = set(np.flatnonzero(overlap.getnnz(axis=1)))
+        affected.update(changed_positions)
+        neighbours = RecipeSimilarity.objects.filter(
+            similar_id__in=changed
+        ).values_list("recipe_id", flat=True)
+        affected.update(
+            np.searchsorted(recipe_ids, list(set(neighbours)))
+        )
+        return np.array(sorted(affected), dtype=np.int64)
+
+    def rebuild(self, recipe_ids, matrix, positions, top, digests):
+        scores = (matrix[positions] @ matrix.T).tocsr()
+        similarities = []
+        for row, position in enumerate(positions):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            candidates = scores.indices[start:end]
+            values = scores.data[start:end]
+            keep = candidates != position
+            candidates, values = candidates[keep], values[keep]
+            if len(candidates) > top:
+                best = np.argpartition(-values, top)[:top]
+                candidates, values = candidates[best], values[best]
+            similarities.extend(
+                RecipeSimilarity(
+                    recipe_id=int(recipe_ids[position]),
+                    similar_id=int(recipe_ids[candidate]),
+                    score=float(value),
+                )
+                for candidate, value in zip(candidates, values)
+            )
+        batch_ids = [int(recipe_ids[position]) for position in positions]
+        with transaction.atomic():
+            RecipeSimilarity.objects.filter(recipe_id__in=batch_ids).delete()
+            RecipeSimilarity.objects.bulk_create(
+                similarities, batch_size=1000
+            )
+            RecipeFingerprint.objects.bulk_create(
+                [
+                    RecipeFingerprint(
+                        recipe_id=recipe_id, digest=digests[recipe_id]
+                    )
+                    for recipe_id in batch_ids
+                ],
+                update_conflicts=True,
+                unique_fields=("recipe",),
+                update_fields=("digest",),
+            )
@@ -0,0 +1,89 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.events import dispatch, events_after, settled_events
+from recipes.models import EventCursor, EventFailure
+
+
+class Command(BaseCommand):
+    help = (
+        "Обработка журнала изменений зарегистрированными обработчиками. "
+        "Позиция хранится в EventCursor и сдвигается в одной транзакции "
+        "с обработкой пачки. События, на которых упал обработчик, "
+        "сохраняются в EventFailure."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--name",
+            default="default",
+            help="Имя позиции в журнале",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Пауза между опросами пустого журнала, в секундах",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Обработать накопленные события и завершиться",
+        )
+
+    def handle(self, *args, **options):
+        EventCursor.objects.get_or_create(name=options["name"])
+        while True:
+            try:
+                processed = self.consume(
+                    options["name"], options["batch_size"]
+                )
+            except Exception as error:
+                if options["once"]:
+                    raise CommandError(error)
+                self.stderr.write(f"Ошибка обработки: {error!r}")
+                processed = 0
+            if processed:
+                self.stdout.write(f"Обработано событий: {processed}")
+            elif options["once"]:
+                return
+            else:
+                time.sleep(options["interval"])
+
+    @transaction.atomic
+    def consume(self, name, batch_size):
+        cursor = EventCursor.objects.select_for_update().get(name=name)
+        events, position, _ = events_after(
+            settled_events(), cursor.position, batch_size
+        )
+        if not events:
+            return 0
+        try:
+            with transaction.atomic():
+                dispatch(events)
+        except Exception:
+            self.dispatch_each(name, events)
+        cursor.position = position
+        cursor.save(update_fields=("position", "updated_at"))
+        return len(events)
+
+    def dispatch_each(self, name, events):
+        """Обрабатывает пачку по одному событию, чтобы найти упавшие.
+
+        Упавшие события сохраняются, а не блокируют журнал: иначе
+        обработчик повторял бы ту же пачку бесконечно.
+        """
+        for event in events:
+            try:
+                with transaction.atomic():
+                    dispatch([event])
+            except Exception as error:
+                EventFailure.objects.create(
+                    consumer=name, event_id=event.id, error=repr(error)
+                )
+                self.stderr.write(
+                    f"Ошибка обработки события {event.id}: {error!r}"
+                )
@@ -0,0 +1,40 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from recipes.exports import export_recipes, recipe_to_dict
+
+
+class Command(BaseCommand):
+    help = "Выгрузка рецептов в формате JSON Lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="Файл для выгрузки, по умолчанию stdout",
+        )
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        recipes = export_recipes().iterator(
+            chunk_size=options["chunk_size"]
+        )
+        output = (
+            sys.stdout
+            if options["output"] == "-"
+            else open(options["output"], "w", encoding="utf-8")
+        )
+        count = 0
+        try:
+            for recipe in recipes:
+                output.write(
+                    json.dumps(recipe_to_dict(recipe), ensure_ascii=False)
+                    + "\n"
+                )
+                count += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(f"Выгружено рецептов: {count}"))
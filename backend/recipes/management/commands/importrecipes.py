@@ -0,0 +1,250 @@
+import json
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.services import invalidate_feed_heads, reset_shared_payloads
+from recipes.events import record_events
+from recipes.models import (ChangeEvent, Ingredient, Recipe, RecipeIngredient,
+                            Tag,)
+from users.models import Subscribe, User
+
+
+def read_batches(file, size):
+    lines = (line for line in file if line.strip())
+    while True:
+        batch = [json.loads(line) for line in islice(lines, size)]
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Загрузка рецептов из JSON Lines (см. exportrecipes). "
+        "Повторный запуск пропускает уже загруженные рецепты."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="Файл JSON Lines с рецептами")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        self.tags = {tag.slug: tag.pk for tag in Tag.objects.all()}
+        self.ingredients = {
+            (name, unit): pk
+            for pk, name, unit in Ingredient.objects.values_list(
+                "pk", "name", "measurement_unit"
+            )
+        }
+        created = skipped = 0
+        try:
+            file = open(options["input"], encoding="utf-8")
+        except OSError as error:
+            raise CommandError(error)
+        with file:
+            for batch in read_batches(file, options["batch_size"]):
+                batch_created = self.import_batch(batch)
+                created += batch_created
+                skipped += len(batch) - batch_created
+                self.stdout.write(
+                    f"Обработано {created + skipped}, создано {created}"
+                )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Загружено рецептов: {created}, пропущено: {skipped}"
+            )
+        )
+
+    def unique_username(self, username, taken):
+        """Логин автора, не занятый другим пользователем."""
+        if username not in taken:
+            return username
+        taken.update(
+            User.objects.filter(username__startswith=username).values_list(
+                "username", flat=True
+            )
+        )
+        number = 2
+        while f"{username}{number}" in taken:
+            number += 1
+        return f"{username}{number}"
+
+    def resolve_authors(self, batch):
+        """id авторов по email; новые авторы создаются.
+
+        Если логин занят другим пользователем, к нему добавляется номер.
+        Авторы, которых создать не удалось, и их рецепты пропускаются
+        с предупреждением.
+        """
+        authors = {item["author"]["email"]: item["author"] for item in batch}
+        resolved = dict(
+            User.objects.filter(email__in=authors).values_list("email", "pk")
+        )
+        missing = authors.keys() - resolved.keys()
+        if not missing:
+            return resolved
+        taken = set(
+            User.objects.filter(
+                username__in={authors[email]["username"] for email in missing}
+            ).values_list("username", flat=True)
+        )
+        users = []
+        for email in sorted(missing):
+            username = self.unique_username(authors[email]["username"], taken)
+            taken.add(username)
+            if username != authors[email]["username"]:
+                self.stdout.write(
+                    f"Логин {authors[email]['username']} занят, "
+                    f"автор {email} загружен как {username}"
+                )
+            users.append(
+                User(
+                    email=email,
+                    username=username,
+                    first_name=authors[email]["first_name"],
+                    last_name=authors[email]["last_name"],
+                    password="!",
+                )
+            )
+        User.objects.bulk_create(users, ignore_conflicts=True)
+        resolved.update(
+            User.objects.filter(email__in=missing).values_list("email", "pk")
+        )
+        failed = missing - resolved.keys()
+        if failed:
+            self.stderr.write(
+                "Не удалось создать авторов, их рецепты пропущены: "
+                + ", ".join(sorted(failed))
+            )
+        return resolved
+
+    def resolve_tags(self, batch):
+        missing = {
+            tag["slug"]: tag
+            for item in batch
+            for tag in item["tags"]
+            if tag["slug"] not in self.tags
+        }
+        if missing:
+            Tag.objects.bulk_create(
+                [Tag(**tag) for tag in missing.values()],
+                ignore_conflicts=True,
+            )
+            created = dict(
+                Tag.objects.filter(slug__in=missing).values_list("slug", "pk")
+            )
+            self.tags.update(created)
+            record_events(
+                ChangeEvent.TAG, created.values(), ChangeEvent.CREATED
+            )
+
+    def resolve_ingredients(self, batch):
+        missing = {
+            (ingredient["name"], ingredient["measurement_unit"])
+            for item in batch
+            for ingredient in item["ingredients"]
+        } - self.ingredients.keys()
+        if missing:
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(name=name, measurement_unit=unit)
+                    for name, unit in missing
+                ],
+                ignore_conflicts=True,
+            )
+            names = {name for name, _ in missing}
+            created = []
+            for pk, name, unit in Ingredient.objects.filter(
+                name__in=names
+            ).values_list("pk", "name", "measurement_unit"):
+                self.ingredients[name, unit] = pk
+                if (name, unit) in missing:
+                    created.append(pk)
+            record_events(
+                ChangeEvent.INGREDIENT, created, ChangeEvent.CREATED
+            )
+
+    @transaction.atomic
+    def import_batch(self, batch):
+        authors = self.resolve_authors(batch)
+        self.resolve_tags(batch)
+        self.resolve_ingredients(batch)
+        existing = set(
+            Recipe.objects.filter(
+                author_id__in=authors.values(),
+                name__in={item["name"] for item in batch},
+            ).values_list("author_id", "name")
+        )
+        recipes, items = [], []
+        for item in batch:
+            author_id = authors.get(item["author"]["email"])
+            key = (author_id, item["name"])
+            if author_id is None or key in existing:
+                continue
+            existing.add(key)
+            # Повторы ингредиента в рецепте складываются.
+            amounts = defaultdict(int)
+            for ingredient in item["ingredients"]:
+                amounts[
+                    self.ingredients[
+                        ingredient["name"], ingredient["measurement_unit"]
+                    ]
+                ] += ingredient["amount"]
+            recipes.append(
+                Recipe(
+                    author_id=author_id,
+                    name=item["name"],
+                    text=item["text"],
+                    cooking_time=item["cooking_time"],
+                    servings=item.get("servings", 1),
+                    image=item["image"],
+                    ingredient_ids=sorted(amounts),
+                )
+            )
+            items.append((item, amounts))
+        Recipe.objects.bulk_create(recipes)
+        for recipe, (item, _) in zip(recipes, items):
+            recipe.pub_date = datetime.fromisoformat(item["pub_date"])
+        Recipe.objects.bulk_update(recipes, ["pub_date"])
+        Recipe.tags.through.objects.bulk_create(
+            [
+                Recipe.tags.through(
+                    recipe_id=recipe.pk, tag_id=self.tags[tag["slug"]]
+                )
+                for recipe, (item, _) in zip(recipes, items)
+                for tag in item["tags"]
+                if tag["slug"] in self.tags
+            ],
+            ignore_conflicts=True,
+        )
+        RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(
+                    recipe_id=recipe.pk,
+                    ingredient_id=ingredient_id,
+                    amount=amount,
+                )
+                for recipe, (_, amounts) in zip(recipes, items)
+                for ingredient_id, amount in amounts.items()
+            ]
+        )
+        record_events(
+            ChangeEvent.RECIPE,
+            [recipe.pk for recipe in recipes],
+            ChangeEvent.CREATED,
+        )
+        if recipes:
+            author_ids = {recipe.author_id for recipe in recipes}
+            transaction.on_commit(reset_shared_payloads)
+            transaction.on_commit(
+                lambda: invalidate_feed_heads(
+                    Subscribe.objects.filter(
+                        author_id__in=author_ids
+                    ).values_list("user_id", flat=True)
+                )
+            )
+        return len(recipes)
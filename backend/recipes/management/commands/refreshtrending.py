@@ -0,0 +1,111 @@
+import math
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from recipes.models import Favorited, Recipe, RecipeRank, ShoppingCart
+
+TRENDING_SQL = """
+    SELECT event.recipe_id,
+           SUM(event.weight) FILTER (WHERE event.kind = 'favorite'),
+           SUM(event.weight) FILTER (WHERE event.kind = 'shopping_cart'),
+           COUNT(*) FILTER (WHERE event.kind = 'favorite'),
+           COUNT(*) FILTER (WHERE event.kind = 'shopping_cart')
+    FROM (
+        SELECT recipe_id, 'favorite' AS kind,
+               EXP(EXTRACT(EPOCH FROM %(now)s - created)::float * %(rate)s)
+                   AS weight
+        FROM {favorited}
+        UNION ALL
+        SELECT recipe_id, 'shopping_cart',
+               EXP(EXTRACT(EPOCH FROM %(now)s - created)::float * %(rate)s)
+        FROM {shopping_cart}
+    ) AS event
+    JOIN {recipe} ON {recipe}.id = event.recipe_id
+    GROUP BY event.recipe_id
+"""
+
+
+def trending_rows(now, half_life_hours):
+    """Веса и количества добавлений по рецептам одним проходом.
+
+    Добавления в избранное и в список покупок объединяются и
+    группируются по рецепту, так что стоимость пересчета растет с
+    числом добавлений, а не с произведением рецептов на добавления.
+    """
+    sql = TRENDING_SQL.format(
+        favorited=Favorited._meta.db_table,
+        shopping_cart=ShoppingCart._meta.db_table,
+        recipe=Recipe._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql,
+            {"now": now, "rate": -math.log(2) / (half_life_hours * 3600)},
+        )
+        for row in cursor.fetchall():
+            recipe_id, favorites, shopping_cart, *counts = row
+            yield (recipe_id, favorites or 0.0, shopping_cart or 0.0, *counts)
+
+
+class Command(BaseCommand):
+    help = "Пересчет рейтинга популярных рецептов (запускается по cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--half-life",
+            type=float,
+            default=settings.TRENDING_HALF_LIFE_HOURS,
+            help="Период полураспада веса добавления, в часах",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        half_life = options["half_life"]
+        rows = trending_rows(now, half_life)
+        ranks = [
+            RecipeRank(
+                recipe_id=recipe_id,
+                score=(
+                    favorites_score * settings.TRENDING_FAVORITE_WEIGHT
+                    + shopping_cart_score
+                    * settings.TRENDING_SHOPPING_CART_WEIGHT
+                ),
+                favorites_count=favorites_count,
+                shopping_cart_count=shopping_cart_count,
+            )
+            for (
+                recipe_id,
+                favorites_score,
+                shopping_cart_score,
+                favorites_count,
+                shopping_cart_count,
+            ) in rows
+        ]
+        # Уникальное место - ключ keyset-пагинации, равные рейтинги
+        # упорядочиваются по id рецепта.
+        ranks.sort(key=lambda rank: (-rank.score, rank.recipe_id))
+        for position, rank in enumerate(ranks, start=1):
+            rank.position = position
+        with transaction.atomic():
+            RecipeRank.objects.exclude(
+                recipe_id__in=[rank.recipe_id for rank in ranks]
+            ).delete()
+            RecipeRank.objects.bulk_create(
+                ranks,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=("recipe",),
+                update_fields=(
+                    "score",
+                    "position",
+                    "favorites_count",
+                    "shopping_cart_count",
+                    "updated_at",
+                ),
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Рейтинг пересчитан: {len(ranks)} рецептов")
+        )
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.3 on 2026-10-19 07:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0004_remove_subscribe_author_remove_subscribe_user_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeRank",
+            fields=[
+                (
+                    "recipe",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="rank",
+                        serialize=False,
+                        to="recipes.recipe",
+                        verbose_name="Рецепт",
+                    ),
+                ),
+                (
+                    "score",
+                    models.FloatField(db_index=True, default=0, verbose_name="Рейтинг"),
+                ),
+                (
+                    "favorites_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Добавлений в избранное"
+                    ),
+                ),
+                (
+                    "shopping_cart_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Добавлений в список покупок"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Дата пересчета"),
+                ),
+            ],
+            options={
+                "verbose_name": "Рейтинг рецепта",
+                "verbose_name_plural": "Рейтинги рецептов",
+                "ordering": ("-score",),
+            },
+        ),
+        migrations.AddField(
+            model_name="favorited",
+            name="created",
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=django.utils.timezone.now,
+                verbose_name="Дата добавления",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="shoppingcart",
+            name="created",
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=django.utils.timezone.now,
+                verbose_name="Дата добавления",
+            ),
+            preserve_default=False,
+        ),
+    ]
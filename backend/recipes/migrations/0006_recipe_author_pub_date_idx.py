@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-19 07:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0005_recipe_rank"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["author", "-pub_date"], name="recipe_author_pub_date_idx"
+            ),
+        ),
+    ]
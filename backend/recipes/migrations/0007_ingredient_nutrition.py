@@ -0,0 +1,53 @@
+# Generated by Django 4.2.3 on 2026-10-19 07:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0006_recipe_author_pub_date_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredient",
+            name="calories",
+            field=models.FloatField(
+                blank=True,
+                null=True,
+                verbose_name="Калорийность на единицу измерения, ккал",
+            ),
+        ),
+        migrations.AddField(
+            model_name="ingredient",
+            name="carbohydrates",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="Углеводы на единицу измерения, г"
+            ),
+        ),
+        migrations.AddField(
+            model_name="ingredient",
+            name="fats",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="Жиры на единицу измерения, г"
+            ),
+        ),
+        migrations.AddField(
+            model_name="ingredient",
+            name="price",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                max_digits=10,
+                null=True,
+                verbose_name="Цена за единицу измерения",
+            ),
+        ),
+        migrations.AddField(
+            model_name="ingredient",
+            name="proteins",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="Белки на единицу измерения, г"
+            ),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.3 on 2026-10-19 07:50
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+UNITS = (
+    ("г", "г", 1),
+    ("кг", "г", 1000),
+    ("мл", "мл", 1),
+    ("л", "мл", 1000),
+    ("ст. л.", "мл", 15),
+    ("ч. л.", "мл", 5),
+    ("стакан", "мл", 250),
+    ("капля", "мл", 0.05),
+)
+
+
+def create_units(apps, schema_editor):
+    MeasurementUnit = apps.get_model("recipes", "MeasurementUnit")
+    MeasurementUnit.objects.bulk_create(
+        [
+            MeasurementUnit(name=name, canonical=canonical, factor=factor)
+            for name, canonical, factor in UNITS
+        ],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0007_ingredient_nutrition"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MeasurementUnit",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=20, unique=True, verbose_name="Единица измерения"
+                    ),
+                ),
+                (
+                    "canonical",
+                    models.CharField(max_length=20, verbose_name="Базовая единица"),
+                ),
+                (
+                    "factor",
+                    models.FloatField(
+                        default=1,
+                        validators=[django.core.validators.MinValueValidator(0)],
+                        verbose_name="Коэффициент пересчета в базовую единицу",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Единица измерения",
+                "verbose_name_plural": "Единицы измерения",
+                "ordering": ("name",),
+            },
+        ),
+        migrations.AddField(
+            model_name="ingredient",
+            name="unit",
+            field=models.ForeignObject(
+                from_fields=("measurement_unit",),
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="ingredients",
+                to="recipes.measurementunit",
+                to_fields=("name",),
+                verbose_name="Единица из справочника",
+            ),
+        ),
+        migrations.RunPython(create_units, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.3 on 2026-10-19 07:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0008_measurement_unit"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeFingerprint",
+            fields=[
+                (
+                    "recipe",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="fingerprint",
+                        serialize=False,
+                        to="recipes.recipe",
+                        verbose_name="Рецепт",
+                    ),
+                ),
+                ("digest", models.CharField(max_length=40, verbose_name="Хэш состава")),
+            ],
+            options={
+                "verbose_name": "Отпечаток рецепта",
+                "verbose_name_plural": "Отпечатки рецептов",
+            },
+        ),
+        migrations.CreateModel(
+            name="RecipeSimilarity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField(verbose_name="Сходство")),
+            ],
+            options={
+                "verbose_name": "Похожий рецепт",
+                "verbose_name_plural": "Похожие рецепты",
+                "ordering": ("recipe", "-score"),
+            },
+        ),
+        migrations.AddField(
+            model_name="recipesimilarity",
+            name="recipe",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="similarities",
+                to="recipes.recipe",
+                verbose_name="Рецепт",
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipesimilarity",
+            name="similar",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="similar_to",
+                to="recipes.recipe",
+                verbose_name="Похожий рецепт",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipesimilarity",
+            index=models.Index(
+                fields=["recipe", "-score"], name="recipe_similarity_score_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="recipesimilarity",
+            constraint=models.UniqueConstraint(
+                fields=("recipe", "similar"), name="unique recipe similarity"
+            ),
+        ),
+    ]
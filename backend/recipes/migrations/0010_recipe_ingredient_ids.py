@@ -0,0 +1,42 @@
+# Generated by Django 4.2.3 on 2026-10-19 07:52
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0009_recipe_similarity"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="ingredient_ids",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.BigIntegerField(),
+                blank=True,
+                default=list,
+                editable=False,
+                size=None,
+                verbose_name="id ингредиентов для поиска по продуктам",
+            ),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE recipes_recipe SET ingredient_ids = ARRAY(
+                SELECT ingredient_id FROM recipes_recipeingredient
+                WHERE recipe_id = recipes_recipe.id
+                ORDER BY ingredient_id
+            )
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["ingredient_ids"], name="recipe_ingredient_ids_gin"
+            ),
+        ),
+    ]
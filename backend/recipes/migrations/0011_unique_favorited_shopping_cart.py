@@ -0,0 +1,39 @@
+# Generated by Django 4.2.3 on 2026-10-19 12:10
+
+from django.db import migrations, models
+
+DEDUPLICATE = """
+    DELETE FROM {table} AS duplicate USING {table} AS original
+    WHERE duplicate.user_id = original.user_id
+        AND duplicate.recipe_id = original.recipe_id
+        AND duplicate.id > original.id
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0010_recipe_ingredient_ids"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            DEDUPLICATE.format(table="recipes_favorited"),
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            DEDUPLICATE.format(table="recipes_shoppingcart"),
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name="favorited",
+            constraint=models.UniqueConstraint(
+                fields=("user", "recipe"), name="unique_favorited"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="shoppingcart",
+            constraint=models.UniqueConstraint(
+                fields=("user", "recipe"), name="unique_shopping_cart"
+            ),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 4.2.3 on 2026-10-19 08:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0011_unique_favorited_shopping_cart"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "entity",
+                    models.CharField(
+                        choices=[
+                            ("recipe", "Рецепт"),
+                            ("ingredient", "Ингредиент"),
+                            ("tag", "Тег"),
+                            ("favorite", "Избранное"),
+                            ("shopping_cart", "Список покупок"),
+                            ("subscription", "Подписка"),
+                        ],
+                        max_length=20,
+                        verbose_name="Сущность",
+                    ),
+                ),
+                ("entity_id", models.BigIntegerField(verbose_name="id сущности")),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("created", "Создание"),
+                            ("updated", "Изменение"),
+                            ("deleted", "Удаление"),
+                        ],
+                        max_length=10,
+                        verbose_name="Действие",
+                    ),
+                ),
+                (
+                    "payload",
+                    models.JSONField(blank=True, default=dict, verbose_name="Данные"),
+                ),
+                (
+                    "user_id",
+                    models.BigIntegerField(
+                        blank=True, null=True, verbose_name="id пользователя"
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата события"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Событие изменения",
+                "verbose_name_plural": "Журнал изменений",
+                "ordering": ("id",),
+            },
+        ),
+        migrations.CreateModel(
+            name="EventCursor",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        max_length=100,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Обработчик",
+                    ),
+                ),
+                (
+                    "position",
+                    models.BigIntegerField(
+                        default=0, verbose_name="Последнее обработанное событие"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Дата обработки"),
+                ),
+            ],
+            options={
+                "verbose_name": "Позиция обработчика",
+                "verbose_name_plural": "Позиции обработчиков",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="changeevent",
+            index=models.Index(fields=["user_id", "id"], name="change_event_user_idx"),
+        ),
+    ]
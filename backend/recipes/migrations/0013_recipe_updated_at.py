@@ -0,0 +1,28 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0012_change_event"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                db_index=True,
+                default=django.utils.timezone.now,
+                verbose_name="Дата изменения",
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunSQL(
+            "UPDATE recipes_recipe SET updated_at = pub_date",
+            migrations.RunSQL.noop,
+        ),
+    ]
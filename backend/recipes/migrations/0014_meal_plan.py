@@ -0,0 +1,83 @@
+# Generated by Django 4.2.3 on 2026-10-19 08:09
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("recipes", "0013_recipe_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MealPlan",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(verbose_name="Дата")),
+                (
+                    "slot",
+                    models.CharField(
+                        choices=[
+                            ("breakfast", "Завтрак"),
+                            ("lunch", "Обед"),
+                            ("dinner", "Ужин"),
+                            ("snack", "Перекус"),
+                        ],
+                        max_length=10,
+                        verbose_name="Прием пищи",
+                    ),
+                ),
+                (
+                    "servings",
+                    models.PositiveSmallIntegerField(
+                        default=1,
+                        validators=[django.core.validators.MinValueValidator(1)],
+                        verbose_name="Порций",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "План питания",
+                "verbose_name_plural": "Планы питания",
+                "ordering": ("date", "slot"),
+            },
+        ),
+        migrations.AddField(
+            model_name="mealplan",
+            name="recipe",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="meal_plans",
+                to="recipes.recipe",
+                verbose_name="Рецепт",
+            ),
+        ),
+        migrations.AddField(
+            model_name="mealplan",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="meal_plan",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Пользователь",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="mealplan",
+            constraint=models.UniqueConstraint(
+                fields=("user", "date", "slot", "recipe"), name="unique_meal_plan_entry"
+            ),
+        ),
+    ]
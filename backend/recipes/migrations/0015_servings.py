@@ -0,0 +1,39 @@
+# Generated by Django 4.2.3 on 2026-10-19 08:10
+
+from decimal import Decimal
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0014_meal_plan"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="servings",
+            field=models.PositiveSmallIntegerField(
+                default=1,
+                validators=[django.core.validators.MinValueValidator(1)],
+                verbose_name="Количество порций",
+            ),
+        ),
+        migrations.AddField(
+            model_name="shoppingcart",
+            name="multiplier",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                help_text="Пусто - столько порций, сколько в рецепте",
+                max_digits=6,
+                null=True,
+                validators=[
+                    django.core.validators.MinValueValidator(Decimal("0.01"))
+                ],
+                verbose_name="Порций к приготовлению",
+            ),
+        ),
+    ]
@@ -0,0 +1,119 @@
+# Generated by Django 4.2.3 on 2026-10-19 08:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("recipes", "0015_servings"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExportJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("shopping_list", "Список покупок"),
+                            ("account", "Данные аккаунта"),
+                            ("recipes", "Рецепты"),
+                        ],
+                        max_length=20,
+                        verbose_name="Вид выгрузки",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "В очереди"),
+                            ("running", "Выполняется"),
+                            ("done", "Готово"),
+                            ("failed", "Ошибка"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "fingerprint",
+                    models.CharField(max_length=32, verbose_name="Отпечаток данных"),
+                ),
+                (
+                    "file",
+                    models.FileField(
+                        blank=True, upload_to="exports/", verbose_name="Файл"
+                    ),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="Ошибка")),
+                (
+                    "created",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата постановки в очередь"
+                    ),
+                ),
+                (
+                    "started",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Дата запуска"
+                    ),
+                ),
+                (
+                    "finished",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Дата завершения"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Выгрузка",
+                "verbose_name_plural": "Выгрузки",
+                "ordering": ("-id",),
+            },
+        ),
+        migrations.AddField(
+            model_name="exportjob",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="export_jobs",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Пользователь",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="exportjob",
+            index=models.Index(fields=["status", "id"], name="export_job_status_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="exportjob",
+            index=models.Index(
+                fields=["kind", "fingerprint"], name="export_job_fingerprint_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="ingredient",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, verbose_name="Дата изменения"),
+        ),
+        migrations.AddField(
+            model_name="tag",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, verbose_name="Дата изменения"),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.3 on 2026-10-19 08:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0016_export_job"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="card_json",
+            field=models.JSONField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Готовая карточка рецепта",
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.3 on 2026-10-19 08:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0017_recipe_card_json"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="changeevent",
+            name="entity",
+            field=models.CharField(
+                choices=[
+                    ("recipe", "Рецепт"),
+                    ("ingredient", "Ингредиент"),
+                    ("tag", "Тег"),
+                    ("favorite", "Избранное"),
+                    ("shopping_cart", "Список покупок"),
+                    ("subscription", "Подписка"),
+                    ("user", "Профиль пользователя"),
+                ],
+                max_length=20,
+                verbose_name="Сущность",
+            ),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 4.2.3 on 2026-10-19 09:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0018_change_event_user"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EventFailure",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "consumer",
+                    models.CharField(max_length=100, verbose_name="Обработчик"),
+                ),
+                ("event_id", models.BigIntegerField(verbose_name="id события")),
+                ("error", models.TextField(verbose_name="Ошибка")),
+                (
+                    "created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Дата ошибки"),
+                ),
+            ],
+            options={
+                "verbose_name": "Необработанное событие",
+                "verbose_name_plural": "Необработанные события",
+                "ordering": ("-created",),
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name="changeevent",
+            name="change_event_user_idx",
+        ),
+        migrations.AddField(
+            model_name="changeevent",
+            name="xact_id",
+            field=models.BigIntegerField(default=0, verbose_name="Транзакция"),
+            preserve_default=False,
+        ),
+        # xmin строки - 32-битный номер вставившей ее транзакции,
+        # эпоха берется от текущей.
+        migrations.RunSQL(
+            """
+            UPDATE recipes_changeevent SET xact_id =
+                (pg_current_xact_id()::text::bigint >> 32 << 32)
+                + xmin::text::bigint
+                - CASE WHEN xmin::text::bigint
+                    > pg_current_xact_id()::text::bigint & 4294967295
+                THEN 4294967296 ELSE 0 END
+            """,
+            migrations.RunSQL.noop,
+        ),
+        # Позиция становится номером транзакции: с первой транзакции,
+        # в которой есть необработанные события.
+        migrations.RunSQL(
+            """
+            UPDATE recipes_eventcursor SET position = COALESCE(
+                (
+                    SELECT MIN(xact_id) - 1 FROM recipes_changeevent
+                    WHERE id > recipes_eventcursor.position
+                ),
+                (SELECT MAX(xact_id) FROM recipes_changeevent),
+                0
+            )
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name="eventcursor",
+            name="position",
+            field=models.BigIntegerField(
+                default=0, verbose_name="Последняя обработанная транзакция"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="changeevent",
+            index=models.Index(fields=["xact_id", "id"], name="change_event_xact_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="changeevent",
+            index=models.Index(
+                fields=["user_id", "xact_id"], name="change_event_user_xact_idx"
+            ),
+        ),
+    ]
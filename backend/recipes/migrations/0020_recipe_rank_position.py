@@ -0,0 +1,49 @@
+# Generated by Django 4.2.3 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0019_change_event_xact_id"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="reciperank",
+            options={
+                "ordering": ("position",),
+                "verbose_name": "Рейтинг рецепта",
+                "verbose_name_plural": "Рейтинги рецептов",
+            },
+        ),
+        migrations.AddField(
+            model_name="reciperank",
+            name="position",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Место в рейтинге"
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE recipes_reciperank SET position = ranked.position
+            FROM (
+                SELECT recipe_id, ROW_NUMBER() OVER (
+                    ORDER BY score DESC, recipe_id
+                ) AS position
+                FROM recipes_reciperank
+            ) AS ranked
+            WHERE recipes_reciperank.recipe_id = ranked.recipe_id
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name="reciperank",
+            constraint=models.UniqueConstraint(
+                deferrable=models.Deferrable["DEFERRED"],
+                fields=("position",),
+                name="unique rank position",
+            ),
+        ),
+    ]
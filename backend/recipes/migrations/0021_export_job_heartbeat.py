@@ -0,0 +1,24 @@
+# Generated by Django 4.2.3 on 2026-10-19 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0020_recipe_rank_position"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exportjob",
+            name="heartbeat",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Последняя отметка воркера"
+            ),
+        ),
+        migrations.RunSQL(
+            "UPDATE recipes_exportjob SET heartbeat = started "
+            "WHERE status = 'running'",
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,5 +1,8 @@
 import re
+from decimal import Decimal
 
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.core import validators
 from django.db import models
 from django.db.models import UniqueConstraint
@@ -30,6 +33,10 @@ class Tag(models.Model):
         verbose_name="Slug",
         unique=True,
     )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения",
+        auto_now=True,
+    )
 
     class Meta:
         verbose_name = "Тег"
@@ -40,6 +47,33 @@ class Tag(models.Model):
         return f"Тег {self.name}"
 
 
+class MeasurementUnit(models.Model):
+    """Создадим класс для справочника единиц измерения"""
+
+    name = models.CharField(
+        verbose_name="Единица измерения",
+        max_length=20,
+        unique=True,
+    )
+    canonical = models.CharField(
+        verbose_name="Базовая единица",
+        max_length=20,
+    )
+    factor = models.FloatField(
+        verbose_name="Коэффициент пересчета в базовую единицу",
+        default=1,
+        validators=[validators.MinValueValidator(0)],
+    )
+
+    class Meta:
+        ordering = ("name",)
+        verbose_name = "Единица измерения"
+        verbose_name_plural = "Единицы измерения"
+
+    def __str__(self):
+        return f"{self.name} = {self.factor} {self.canonical}"
+
+
 class Ingredient(models.Model):
     """Создадим класс для Ингредиентов"""
 
@@ -51,6 +85,46 @@ class Ingredient(models.Model):
         verbose_name="Единицы изменения",
         max_length=20,
     )
+    unit = models.ForeignObject(
+        MeasurementUnit,
+        verbose_name="Единица из справочника",
+        on_delete=models.DO_NOTHING,
+        from_fields=("measurement_unit",),
+        to_fields=("name",),
+        related_name="ingredients",
+        null=True,
+    )
+    calories = models.FloatField(
+        verbose_name="Калорийность на единицу измерения, ккал",
+        null=True,
+        blank=True,
+    )
+    proteins = models.FloatField(
+        verbose_name="Белки на единицу измерения, г",
+        null=True,
+        blank=True,
+    )
+    fats = models.FloatField(
+        verbose_name="Жиры на единицу измерения, г",
+        null=True,
+        blank=True,
+    )
+    carbohydrates = models.FloatField(
+        verbose_name="Углеводы на единицу измерения, г",
+        null=True,
+        blank=True,
+    )
+    price = models.DecimalField(
+        verbose_name="Цена за единицу измерения",
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения",
+        auto_now=True,
+    )
 
     class Meta:
         ordering = ("name",)
@@ -105,15 +179,48 @@ class Recipe(models.Model):
             ),
         ],
     )
+    servings = models.PositiveSmallIntegerField(
+        verbose_name="Количество порций",
+        default=1,
+        validators=[validators.MinValueValidator(1)],
+    )
     pub_date = models.DateTimeField(
         verbose_name="Дата публикации",
         auto_now_add=True,
     )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения",
+        auto_now=True,
+        db_index=True,
+    )
+    ingredient_ids = ArrayField(
+        models.BigIntegerField(),
+        verbose_name="id ингредиентов для поиска по продуктам",
+        default=list,
+        blank=True,
+        editable=False,
+    )
+    card_json = models.JSONField(
+        verbose_name="Готовая карточка рецепта",
+        null=True,
+        blank=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ("-pub_date",)
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
+        indexes = [
+            models.Index(
+                fields=("author", "-pub_date"),
+                name="recipe_author_pub_date_idx",
+            ),
+            GinIndex(
+                fields=("ingredient_ids",),
+                name="recipe_ingredient_ids_gin",
+            ),
+        ]
 
     def __str__(self):
         return f'Рецепт "{self.name}" от {self.author}'
@@ -173,11 +280,20 @@ class Favorited(models.Model):
         verbose_name="Рецепт в списке избранных",
         on_delete=models.CASCADE,
     )
+    created = models.DateTimeField(
+        verbose_name="Дата добавления",
+        auto_now_add=True,
+    )
 
     class Meta:
         ordering = ("user", "recipe")
         verbose_name = "Избранное"
         verbose_name_plural = "Избранные"
+        constraints = [
+            models.UniqueConstraint(
+                fields=("user", "recipe"), name="unique_favorited"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user} добавил {self.recipe} в избранное."
@@ -198,11 +314,429 @@ class ShoppingCart(models.Model):
         related_name="shopping_cart",
         on_delete=models.CASCADE,
     )
+    multiplier = models.DecimalField(
+        verbose_name="Порций к приготовлению",
+        help_text="Пусто - столько порций, сколько в рецепте",
+        max_digits=6,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        validators=[validators.MinValueValidator(Decimal("0.01"))],
+    )
+    created = models.DateTimeField(
+        verbose_name="Дата добавления",
+        auto_now_add=True,
+    )
 
     class Meta:
         ordering = ("user", "recipe")
         verbose_name = "Список покупок"
         verbose_name_plural = "Списки покупок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=("user", "recipe"), name="unique_shopping_cart"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user} добавил {self.recipe} в cписок покупок."
+
+
+class MealPlan(models.Model):
+    """Создадим класс для Плана питания"""
+
+    BREAKFAST = "breakfast"
+    LUNCH = "lunch"
+    DINNER = "dinner"
+    SNACK = "snack"
+    SLOTS = (
+        (BREAKFAST, "Завтрак"),
+        (LUNCH, "Обед"),
+        (DINNER, "Ужин"),
+        (SNACK, "Перекус"),
+    )
+
+    user = models.ForeignKey(
+        User,
+        verbose_name="Пользователь",
+        related_name="meal_plan",
+        on_delete=models.CASCADE,
+    )
+    date = models.DateField(
+        verbose_name="Дата",
+    )
+    slot = models.CharField(
+        verbose_name="Прием пищи",
+        max_length=10,
+        choices=SLOTS,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name="Рецепт",
+        related_name="meal_plans",
+        on_delete=models.CASCADE,
+    )
+    servings = models.PositiveSmallIntegerField(
+        verbose_name="Порций",
+        default=1,
+        validators=[validators.MinValueValidator(1)],
+    )
+
+    class Meta:
+        ordering = ("date", "slot")
+        verbose_name = "План питания"
+        verbose_name_plural = "Планы питания"
+        constraints = [
+            models.UniqueConstraint(
+                fields=("user", "date", "slot", "recipe"),
+                name="unique_meal_plan_entry",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.date} {self.slot}: {self.recipe}"
+
+
+class RecipeRank(models.Model):
+    """Создадим класс для предрассчитанного рейтинга популярности"""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name="Рецепт",
+        related_name="rank",
+        primary_key=True,
+        on_delete=models.CASCADE,
+    )
+    score = models.FloatField(
+        verbose_name="Рейтинг",
+        default=0,
+        db_index=True,
+    )
+    position = models.PositiveIntegerField(
+        verbose_name="Место в рейтинге",
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name="Добавлений в избранное",
+        default=0,
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name="Добавлений в список покупок",
+        default=0,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата пересчета",
+        auto_now=True,
+    )
+
+    class Meta:
+        ordering = ("position",)
+        constraints = [
+            # Места меняются местами при пересчете, поэтому уникальность
+            # проверяется в конце транзакции.
+            models.UniqueConstraint(
+                fields=["position"],
+                name="unique rank position",
+                deferrable=models.Deferrable.DEFERRED,
+            )
+        ]
+        verbose_name = "Рейтинг рецепта"
+        verbose_name_plural = "Рейтинги рецептов"
+
+    def __str__(self):
+        return f"{self.recipe_id}: {self.score:.3f}"
+
+
+class RecipeSimilarity(models.Model):
+    """Создадим класс для предрассчитанных похожих рецептов"""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name="Рецепт",
+        related_name="similarities",
+        on_delete=models.CASCADE,
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        verbose_name="Похожий рецепт",
+        related_name="similar_to",
+        on_delete=models.CASCADE,
+    )
+    score = models.FloatField(
+        verbose_name="Сходство",
+    )
+
+    class Meta:
+        ordering = ("recipe", "-score")
+        verbose_name = "Похожий рецепт"
+        verbose_name_plural = "Похожие рецепты"
+        constraints = [
+            UniqueConstraint(
+                fields=["recipe", "similar"], name="unique recipe similarity"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=("recipe", "-score"),
+                name="recipe_similarity_score_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} ~ {self.similar_id}: {self.score:.3f}"
+
+
+class RecipeFingerprint(models.Model):
+    """Отпечаток состава рецепта на момент построения индекса похожих"""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name="Рецепт",
+        related_name="fingerprint",
+        primary_key=True,
+        on_delete=models.CASCADE,
+    )
+    digest = models.CharField(
+        verbose_name="Хэш состава",
+        max_length=40,
+    )
+
+    class Meta:
+        verbose_name = "Отпечаток рецепта"
+        verbose_name_plural = "Отпечатки рецептов"
+
+    def __str__(self):
+        return f"{self.recipe_id}: {self.digest}"
+
+
+class ChangeEvent(models.Model):
+    """Создадим класс для журнала изменений (outbox)
+
+    Событие пишется в той же транзакции, что и само изменение.
+    События без пользователя публичные, остальные видны только ему.
+    Внешних ключей нет: события удаленных объектов остаются в журнале.
+    """
+
+    RECIPE = "recipe"
+    INGREDIENT = "ingredient"
+    TAG = "tag"
+    FAVORITE = "favorite"
+    SHOPPING_CART = "shopping_cart"
+    SUBSCRIPTION = "subscription"
+    USER = "user"
+    ENTITIES = (
+        (RECIPE, "Рецепт"),
+        (INGREDIENT, "Ингредиент"),
+        (TAG, "Тег"),
+        (FAVORITE, "Избранное"),
+        (SHOPPING_CART, "Список покупок"),
+        (SUBSCRIPTION, "Подписка"),
+        (USER, "Профиль пользователя"),
+    )
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    ACTIONS = (
+        (CREATED, "Создание"),
+        (UPDATED, "Изменение"),
+        (DELETED, "Удаление"),
+    )
+
+    entity = models.CharField(
+        verbose_name="Сущность",
+        max_length=20,
+        choices=ENTITIES,
+    )
+    entity_id = models.BigIntegerField(
+        verbose_name="id сущности",
+    )
+    action = models.CharField(
+        verbose_name="Действие",
+        max_length=10,
+        choices=ACTIONS,
+    )
+    payload = models.JSONField(
+        verbose_name="Данные",
+        default=dict,
+        blank=True,
+    )
+    user_id = models.BigIntegerField(
+        verbose_name="id пользователя",
+        null=True,
+        blank=True,
+    )
+    created = models.DateTimeField(
+        verbose_name="Дата события",
+        auto_now_add=True,
+    )
+    xact_id = models.BigIntegerField(
+        verbose_name="Транзакция",
+    )
+
+    class Meta:
+        ordering = ("id",)
+        verbose_name = "Событие изменения"
+        verbose_name_plural = "Журнал изменений"
+        indexes = [
+            models.Index(
+                fields=("xact_id", "id"),
+                name="change_event_xact_idx",
+            ),
+            models.Index(
+                fields=("user_id", "xact_id"),
+                name="change_event_user_xact_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.id}: {self.entity} {self.entity_id} {self.action}"
+
+
+class EventCursor(models.Model):
+    """Создадим класс для позиции обработчика журнала изменений"""
+
+    name = models.CharField(
+        verbose_name="Обработчик",
+        max_length=100,
+        primary_key=True,
+    )
+    position = models.BigIntegerField(
+        verbose_name="Последняя обработанная транзакция",
+        default=0,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата обработки",
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = "Позиция обработчика"
+        verbose_name_plural = "Позиции обработчиков"
+
+    def __str__(self):
+        return f"{self.name}: {self.position}"
+
+
+class EventFailure(models.Model):
+    """Создадим класс для событий, на которых упал обработчик журнала
+
+    Позиция обработчика сдвигается дальше, а событие остается здесь
+    для разбора и повторной обработки.
+    """
+
+    consumer = models.CharField(
+        verbose_name="Обработчик",
+        max_length=100,
+    )
+    event_id = models.BigIntegerField(
+        verbose_name="id события",
+    )
+    error = models.TextField(
+        verbose_name="Ошибка",
+    )
+    created = models.DateTimeField(
+        verbose_name="Дата ошибки",
+        auto_now_add=True,
+    )
+
+    class Meta:
+        ordering = ("-created",)
+        verbose_name = "Необработанное событие"
+        verbose_name_plural = "Необработанные события"
+
+    def __str__(self):
+        return f"{self.consumer}: {self.event_id}"
+
+
+class ExportJob(models.Model):
+    """Создадим класс для фоновой выгрузки данных пользователя
+
+    Задания выполняет команда runjobs. Отпечаток описывает состояние
+    исходных данных: готовый файл с тем же отпечатком переиспользуется.
+    """
+
+    SHOPPING_LIST = "shopping_list"
+    ACCOUNT = "account"
+    RECIPES = "recipes"
+    KINDS = (
+        (SHOPPING_LIST, "Список покупок"),
+        (ACCOUNT, "Данные аккаунта"),
+        (RECIPES, "Рецепты"),
+    )
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (PENDING, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Готово"),
+        (FAILED, "Ошибка"),
+    )
+
+    user = models.ForeignKey(
+        User,
+        verbose_name="Пользователь",
+        on_delete=models.CASCADE,
+        related_name="export_jobs",
+    )
+    kind = models.CharField(
+        verbose_name="Вид выгрузки",
+        max_length=20,
+        choices=KINDS,
+    )
+    status = models.CharField(
+        verbose_name="Статус",
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    fingerprint = models.CharField(
+        verbose_name="Отпечаток данных",
+        max_length=32,
+    )
+    file = models.FileField(
+        verbose_name="Файл",
+        upload_to="exports/",
+        blank=True,
+    )
+    error = models.TextField(
+        verbose_name="Ошибка",
+        blank=True,
+    )
+    created = models.DateTimeField(
+        verbose_name="Дата постановки в очередь",
+        auto_now_add=True,
+    )
+    started = models.DateTimeField(
+        verbose_name="Дата запуска",
+        null=True,
+        blank=True,
+    )
+    heartbeat = models.DateTimeField(
+        verbose_name="Последняя отметка воркера",
+        null=True,
+        blank=True,
+    )
+    finished = models.DateTimeField(
+        verbose_name="Дата завершения",
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        ordering = ("-id",)
+        verbose_name = "Выгрузка"
+        verbose_name_plural = "Выгрузки"
+        indexes = [
+            models.Index(
+                fields=("status", "id"),
+                name="export_job_status_idx",
+            ),
+            models.Index(
+                fields=("kind", "fingerprint"),
+                name="export_job_fingerprint_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.kind}: {self.status}"
@@ -0,0 +1,81 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.events import record_event
+from recipes.models import (ChangeEvent, Favorited, Ingredient, Recipe,
+                            ShoppingCart, Tag,)
+from users.models import Subscribe, User
+
+CATALOGUE_ENTITIES = {
+    Recipe: ChangeEvent.RECIPE,
+    Ingredient: ChangeEvent.INGREDIENT,
+    Tag: ChangeEvent.TAG,
+}
+USER_ENTITIES = {
+    Favorited: (ChangeEvent.FAVORITE, "recipe_id"),
+    ShoppingCart: (ChangeEvent.SHOPPING_CART, "recipe_id"),
+    Subscribe: (ChangeEvent.SUBSCRIPTION, "author_id"),
+}
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+def record_catalogue_save(sender, instance, created, **kwargs):
+    record_event(
+        CATALOGUE_ENTITIES[sender],
+        instance.pk,
+        ChangeEvent.CREATED if created else ChangeEvent.UPDATED,
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Tag)
+def record_catalogue_delete(sender, instance, **kwargs):
+    record_event(CATALOGUE_ENTITIES[sender], instance.pk, ChangeEvent.DELETED)
+
+
+@receiver(post_save, sender=User)
+def record_profile_save(sender, instance, created, update_fields=None, **kwargs):
+    """Профиль виден в карточках рецептов; вход в систему не в счет."""
+    if update_fields and set(update_fields) == {"last_login"}:
+        return
+    record_event(
+        ChangeEvent.USER,
+        instance.pk,
+        ChangeEvent.CREATED if created else ChangeEvent.UPDATED,
+        instance.pk,
+    )
+
+
+@receiver(post_delete, sender=User)
+def record_profile_delete(sender, instance, **kwargs):
+    record_event(ChangeEvent.USER, instance.pk, ChangeEvent.DELETED, instance.pk)
+
+
+@receiver(post_save, sender=Favorited)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscribe)
+def record_user_save(sender, instance, created, **kwargs):
+    """Изменение записи (порции в списке покупок) тоже событие."""
+    entity, field = USER_ENTITIES[sender]
+    record_event(
+        entity,
+        getattr(instance, field),
+        ChangeEvent.CREATED if created else ChangeEvent.UPDATED,
+        instance.user_id,
+    )
+
+
+@receiver(post_delete, sender=Favorited)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscribe)
+def record_user_delete(sender, instance, **kwargs):
+    entity, field = USER_ENTITIES[sender]
+    record_event(
+        entity,
+        getattr(instance, field),
+        ChangeEvent.DELETED,
+        instance.user_id,
+    )
@@ -0,0 +1,246 @@
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from recipes import events
+from recipes.models import (ChangeEvent, EventCursor, EventFailure, Favorited,
+                            Ingredient, MeasurementUnit, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag,)
+from users.models import Subscribe, User
+
+ROWS = 5
+
+
+class AdminChangelistTest(TestCase):
+    """Число запросов списков в админке не зависит от числа строк."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="pass"
+        )
+        users = [
+            User.objects.create_user(
+                username=f"user{i}",
+                email=f"user{i}@example.com",
+                password="pass",
+            )
+            for i in range(ROWS)
+        ]
+        tags = [
+            Tag.objects.create(
+                name=f"Тег {i}", color=f"#00000{i}", slug=f"tag{i}"
+            )
+            for i in range(ROWS)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f"Ингредиент {i}", measurement_unit="г"
+            )
+            for i in range(ROWS)
+        ]
+        for i, user in enumerate(users):
+            recipe = Recipe.objects.create(
+                author=user,
+                name=f"Рецепт {i}",
+                text="Описание",
+                cooking_time=10,
+                image="recipes/images/test.png",
+            )
+            recipe.tags.set(tags)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredients[i], amount=100
+            )
+            Favorited.objects.create(user=users[i - 1], recipe=recipe)
+            ShoppingCart.objects.create(user=users[i - 1], recipe=recipe)
+            Subscribe.objects.create(user=users[i - 1], author=user)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def assertChangelistQueries(self, model, num, params=None):
+        url = reverse(
+            f"admin:{model._meta.app_label}_{model._meta.model_name}"
+            "_changelist"
+        )
+        with self.assertNumQueries(num):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            len(response.context["cl"].result_list),
+            model.objects.count(),
+        )
+        return response.context["cl"].result_list
+
+    def test_tag_changelist(self):
+        self.assertChangelistQueries(Tag, 8)
+
+    def test_measurement_unit_changelist(self):
+        self.assertChangelistQueries(MeasurementUnit, 6)
+
+    def test_ingredient_changelist(self):
+        self.assertChangelistQueries(Ingredient, 7)
+
+    def test_recipe_changelist(self):
+        self.assertChangelistQueries(Recipe, 7)
+
+    def test_counts_are_cached(self):
+        self.assertChangelistQueries(Recipe, 7)
+        Favorited.objects.create(
+            user=self.admin, recipe=Recipe.objects.first()
+        )
+        results = self.assertChangelistQueries(Recipe, 6)
+        self.assertEqual(
+            {recipe.favorites_count for recipe in results}, {1}
+        )
+
+    def test_sorting_by_count_uses_subquery(self):
+        Favorited.objects.create(
+            user=self.admin, recipe=Recipe.objects.first()
+        )
+        results = self.assertChangelistQueries(Recipe, 6, {"o": "-5"})
+        self.assertEqual(
+            [recipe.favorites_count for recipe in results],
+            [2, 1, 1, 1, 1],
+        )
+
+    def test_recipe_ingredient_changelist(self):
+        self.assertChangelistQueries(RecipeIngredient, 5)
+
+    def test_favorited_changelist(self):
+        self.assertChangelistQueries(Favorited, 5)
+
+    def test_shopping_cart_changelist(self):
+        self.assertChangelistQueries(ShoppingCart, 5)
+
+    def test_subscribe_changelist(self):
+        self.assertChangelistQueries(Subscribe, 5)
+
+
+class AdminIndexTest(TestCase):
+    def test_index_links_to_custom_pages(self):
+        admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="pass"
+        )
+        self.client.force_login(admin)
+        response = self.client.get(reverse("admin:index"))
+        self.assertEqual(response.status_code, 200)
+        for name in (
+            "admin-dashboard",
+            "admin-slow-queries",
+            "admin-profiles",
+        ):
+            self.assertContains(response, f'href="{reverse(name)}"')
+
+
+class ConsumeEventsTest(TransactionTestCase):
+    """Упавшее событие откладывается, и журнал обрабатывается дальше."""
+
+    def test_failed_event_is_recorded_and_skipped(self):
+        handled = []
+
+        def handle(batch):
+            for event in batch:
+                if event.entity_id == 2:
+                    raise ValueError("сломано")
+            handled.extend(event.entity_id for event in batch)
+
+        events.record_events(
+            ChangeEvent.USER, [1, 2, 3], ChangeEvent.UPDATED
+        )
+        stderr = io.StringIO()
+        with mock.patch.dict(events._handlers, {ChangeEvent.USER: [handle]}):
+            for _ in range(2):
+                call_command(
+                    "consumeevents",
+                    "--once",
+                    stdout=io.StringIO(),
+                    stderr=stderr,
+                )
+        self.assertIn("сломано", stderr.getvalue())
+        self.assertEqual(handled, [1, 3])
+        failure = EventFailure.objects.get()
+        self.assertEqual(failure.consumer, "default")
+        self.assertEqual(
+            failure.event_id,
+            ChangeEvent.objects.get(entity_id=2).pk,
+        )
+        self.assertEqual(
+            EventCursor.objects.get(name="default").position,
+            ChangeEvent.objects.get(entity_id=3).xact_id,
+        )
+
+
+class ImportRecipesTest(TestCase):
+    def setUp(self):
+        User.objects.create_user(
+            username="cook", email="cook@example.com", password="pass"
+        )
+        item = {
+            "author": {
+                "email": "new@example.com",
+                "username": "cook",
+                "first_name": "Новый",
+                "last_name": "Автор",
+            },
+            "name": "Борщ",
+            "text": "Описание",
+            "cooking_time": 60,
+            "servings": 4,
+            "image": "recipes/images/test.png",
+            "pub_date": "2023-07-01T12:00:00+00:00",
+            "tags": [{"name": "Обед", "color": "#FF0000", "slug": "lunch"}],
+            "ingredients": [
+                {"name": "Свекла", "measurement_unit": "г", "amount": 100},
+                {"name": "Свекла", "measurement_unit": "г", "amount": 50},
+            ],
+        }
+        file = tempfile.NamedTemporaryFile(
+            "w", suffix=".jsonl", encoding="utf-8", delete=False
+        )
+        with file:
+            file.write(json.dumps(item, ensure_ascii=False) + "\n")
+        self.addCleanup(os.remove, file.name)
+        self.path = file.name
+
+    def import_recipes(self):
+        with mock.patch(
+            "recipes.management.commands.importrecipes.reset_shared_payloads"
+        ) as reset, self.captureOnCommitCallbacks(execute=True):
+            call_command("importrecipes", self.path, stdout=io.StringIO())
+        return reset
+
+    def test_import(self):
+        reset = self.import_recipes()
+        reset.assert_called_once_with()
+        recipe = Recipe.objects.get(name="Борщ")
+        self.assertEqual(recipe.author.username, "cook2")
+        beet = Ingredient.objects.get(name="Свекла")
+        self.assertEqual(recipe.recipes.get().amount, 150)
+        self.assertEqual(recipe.ingredient_ids, [beet.pk])
+        created = set(
+            ChangeEvent.objects.filter(
+                action=ChangeEvent.CREATED
+            ).values_list("entity", "entity_id")
+        )
+        self.assertLessEqual(
+            {
+                (ChangeEvent.RECIPE, recipe.pk),
+                (ChangeEvent.INGREDIENT, beet.pk),
+                (ChangeEvent.TAG, Tag.objects.get(slug="lunch").pk),
+            },
+            created,
+        )
+
+    def test_second_run_skips_imported(self):
+        self.import_recipes()
+        self.import_recipes()
+        self.assertEqual(Recipe.objects.count(), 1)
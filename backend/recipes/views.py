@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache
+from django.db.models import Count
+from django.template.response import TemplateResponse
+
+from recipes.models import Favorited, Ingredient, Recipe, ShoppingCart, Tag
+from users.models import Subscribe, User
+
+DASHBOARD_CACHE_KEY = "admin:dashboard"
+
+
+def get_dashboard_stats():
+    stats = cache.get(DASHBOARD_CACHE_KEY)
+    if stats is None:
+        stats = {
+            "totals": (
+                ("Пользователи", User.objects.count()),
+                ("Рецепты", Recipe.objects.count()),
+                ("Теги", Tag.objects.count()),
+                ("Ингредиенты", Ingredient.objects.count()),
+                ("Подписки", Subscribe.objects.count()),
+                ("Добавления в избранное", Favorited.objects.count()),
+                ("Рецепты в списках покупок", ShoppingCart.objects.count()),
+                (
+                    "Непустые списки покупок",
+                    ShoppingCart.objects.values("user").distinct().count(),
+                ),
+            ),
+            "top_recipes": list(
+                Recipe.objects.select_related("author")
+                .annotate(favorites_count=Count("favorited"))
+                .filter(favorites_count__gt=0)
+                .order_by("-favorites_count")[:10]
+            ),
+            "top_ingredients": list(
+                Ingredient.objects.annotate(usage_count=Count("ingredients"))
+                .filter(usage_count__gt=0)
+                .order_by("-usage_count")[:10]
+            ),
+        }
+        cache.set(
+            DASHBOARD_CACHE_KEY, stats, settings.DASHBOARD_CACHE_TIMEOUT
+        )
+    return stats
+
+
+def dashboard(request):
+    """Сводная статистика для администраторов."""
+    context = {
+        **admin.site.each_context(request),
+        **get_dashboard_stats(),
+        "title": "Статистика",
+        "cache_timeout": settings.DASHBOARD_CACHE_TIMEOUT,
+    }
+    return TemplateResponse(request, "admin/dashboard.html", context)
@@ -1,6 +1,10 @@
 from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth import get_user_model
+from django.db.models import OuterRef
+
+from recipes.admin_utils import EstimatedCountPaginator, SubqueryCount
+from recipes.models import Recipe
 
 User = get_user_model()
 
@@ -13,16 +17,34 @@ class UserAdmin(admin.ModelAdmin):
         "email",
         "first_name",
         "last_name",
+        "recipes_count",
         "date_joined",
     )
     search_fields = (
-        "email",
-        "username",
+        "^email",
+        "^username",
         "first_name",
         "last_name",
     )
     list_filter = (
-        "username",
-        "email",
+        "is_staff",
+        "is_active",
     )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = settings.EMPTY_VALUE_DISPLAY
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                recipes_count=SubqueryCount(
+                    Recipe.objects.filter(author=OuterRef("pk")).values("pk")
+                )
+            )
+        )
+
+    @admin.display(description="Рецептов", ordering="recipes_count")
+    def recipes_count(self, obj):
+        return obj.recipes_count
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.3 on 2026-10-19 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0006_user_unique_auth"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            """
+            DELETE FROM users_subscribe AS duplicate
+            USING users_subscribe AS original
+            WHERE duplicate.user_id = original.user_id
+                AND duplicate.author_id = original.author_id
+                AND duplicate.id > original.id
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name="subscribe",
+            constraint=models.UniqueConstraint(
+                fields=["user", "author"], name="unique_subscribe"
+            ),
+        ),
+    ]
@@ -39,6 +39,10 @@ class User(AbstractUser):
         verbose_name="Пароль",
         max_length=150,
     )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения",
+        auto_now=True,
+    )
 
     USERNAME_FIELD = "email"
 
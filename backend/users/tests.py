@@ -0,0 +1,37 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from recipes.models import Recipe
+from users.models import User
+
+
+class UserAdminTest(TestCase):
+    """Число запросов списка пользователей не зависит от числа строк."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="pass"
+        )
+        for i in range(5):
+            user = User.objects.create_user(
+                username=f"user{i}",
+                email=f"user{i}@example.com",
+                password="pass",
+            )
+            Recipe.objects.create(
+                author=user,
+                name=f"Рецепт {i}",
+                text="Описание",
+                cooking_time=10,
+                image="recipes/images/test.png",
+            )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_changelist(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("admin:users_user_changelist"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["cl"].result_list), 6)